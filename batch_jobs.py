@@ -0,0 +1,35 @@
+# Pending batch summarization jobs, persisted between runs
+
+import json
+import os
+import re
+
+class BatchJobs:
+    """One JSON file per channel (or feed file) with a pending batch job: its ID, the videos it summarizes,
+    and the summaries that were computed straight away."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def save(self, key, job):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.__path(key)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(temp_path, path)
+
+    def load(self, key):
+        path = self.__path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def remove(self, key):
+        path = self.__path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def __path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_-]', '_', key) + ".json")
@@ -0,0 +1,63 @@
+# Hedging benchmark: tail latency of summary requests to a primary slow now and then, alone and hedged with a secondary
+
+import argparse
+import itertools
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+from fake_openai_server import FakeOpenAIServer
+from summarizer_backends import OpenAIBackend, HedgedBackend
+
+PROMPT = "Summarize the following transcript:\nthe transcript of a benchmark video"
+
+def every_nth_slow(n, fast, slow):
+    counter = itertools.count(1)
+    return lambda: slow if next(counter) % n == 0 else fast
+
+def measure(backend, request_count):
+    # the first request pays for imports and connections, on both backends
+    backend.create(model="benchmark-model", input=PROMPT)
+    backend.latencies.clear()
+    for _ in range(request_count):
+        backend.create(model="benchmark-model", input=PROMPT)
+    stats = backend.stats()
+    backend.close()
+    return stats
+
+def run_hedging_benchmark(request_count=200, slow_every=20, fast_latency=0.01, slow_latency=0.5,
+                          secondary_latency=0.05, hedge_percentile=0.9):
+    """p50 and p99 latencies of request_count requests, to the primary alone and hedged with the secondary."""
+    results = {}
+    for mode in ("unhedged", "hedged"):
+        with FakeOpenAIServer(delay=every_nth_slow(slow_every, fast_latency, slow_latency)) as primary, \
+             FakeOpenAIServer(delay=secondary_latency) as secondary:
+            backend = HedgedBackend(OpenAIBackend("primary", "benchmark", base_url=primary.base_url),
+                                    OpenAIBackend("secondary", "benchmark", base_url=secondary.base_url) if mode == "hedged" else None,
+                                    hedge_percentile=hedge_percentile, initial_hedge_delay=slow_latency / 2, min_samples=10,
+                                    window=request_count)
+            results[mode] = measure(backend, request_count)
+
+    results["p99_improvement"] = results["unhedged"]["latency_p99"] - results["hedged"]["latency_p99"]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hedged summary requests against two local fake backends.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--slow-every", type=int, default=20, help="one primary request in this many is slow")
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--secondary-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    results = run_hedging_benchmark(args.requests, args.slow_every, slow_latency=args.slow_latency,
+                                    secondary_latency=args.secondary_latency)
+    for mode in ("unhedged", "hedged"):
+        result = results[mode]
+        print(f"{mode}: p50 {result['latency_p50'] * 1000:.0f}ms, p99 {result['latency_p99'] * 1000:.0f}ms, "
+              f"{result['hedge_rate']:.0%} hedged, {result['cancelled']} cancelled")
+    print(f"p99 {results['p99_improvement'] * 1000:.0f}ms lower with hedging.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Benchmark of the search index: indexing and query latency over archives of growing size
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from faker import Faker
+from search_index import SearchIndex
+from benchmarks.benchmark_youtube_summarizer import percentile
+
+SIZES = [1000, 10000, 100000]
+
+def run_search_benchmark(summary_count, query_count=100, seed=0):
+    """Index summary_count generated summaries, then time query_count searches of words they contain."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    randomizer = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as scratch_directory:
+        search_index = SearchIndex(os.path.join(scratch_directory, "search.sqlite"))
+        start = time.perf_counter()
+        for i in range(summary_count):
+            markdown = (f"# {fake.sentence()}\n\n{fake.text(max_nb_chars=1500)}\n\n"
+                        f"*Published on {fake.date_time().isoformat()} at https://www.youtube.com/watch?v={i}*\n")
+            search_index.add(f"UC{i % 50:022d}", str(i), markdown)
+        indexing_seconds = time.perf_counter() - start
+
+        words = fake.words(nb=query_count * 2)
+        query_seconds = []
+        results = 0
+        for i in range(query_count):
+            query = " ".join(randomizer.sample(words, randomizer.choice((1, 2))))
+            start = time.perf_counter()
+            results += len(search_index.search(query))
+            query_seconds.append(time.perf_counter() - start)
+        search_index.close()
+
+    return {
+        "summaries": summary_count,
+        "indexing_seconds": indexing_seconds,
+        "query_p50": percentile(query_seconds, 0.50),
+        "query_p99": percentile(query_seconds, 0.99),
+        "results_per_query": results / query_count,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search index on generated archives of growing size.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated numbers of summaries")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        result = run_search_benchmark(size, args.queries, args.seed)
+        print(f"{size} summaries: indexed in {result['indexing_seconds']:.1f}s, query p50 {result['query_p50'] * 1000:.2f}ms, "
+              f"p99 {result['query_p99'] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
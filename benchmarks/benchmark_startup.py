@@ -0,0 +1,84 @@
+# Startup benchmark: import and wall time of a scheduled run finding nothing new, with and without the heavy imports
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+from test_youtube_summarizer import TEST_CHANNEL_ID, build_video_ids, generate_feed_for
+
+# what a run used to import and build before it even read the feed
+HEAVY_MODULES = ["openai", "youtube_transcript_api", "markdown", "asyncio"]
+EAGER_PRELOAD = "import openai, youtube_transcript_api, markdown, asyncio; openai.OpenAI(api_key='benchmark')"
+
+NO_OP_RUN = """
+import json, sys, time
+start = time.perf_counter()
+{preload}
+import youtube_summarizer
+imported = time.perf_counter()
+sys.argv = ["youtube_summarizer.py", "feed.xml", "user@example.com", "--git-commits-off"]
+youtube_summarizer.main()
+print(json.dumps({{"import_seconds": imported - start, "run_seconds": time.perf_counter() - imported,
+                  "heavy_modules": [name for name in {heavy_modules!r} if name in sys.modules]}}))
+"""
+
+def measure_no_op_run(scratch_directory, preload=""):
+    """Run main() in a new interpreter on a feed whose videos are all summarized already."""
+    environment = dict(os.environ, PYTHONPATH=ROOT, OPENAI_API_KEY="benchmark",
+                       GMAIL_USERNAME="benchmark@example.com", GMAIL_PASSWORD="benchmark")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", NO_OP_RUN.format(preload=preload, heavy_modules=HEAVY_MODULES)],
+                            cwd=scratch_directory, env=environment, capture_output=True, text=True)
+    wall_seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"No-op run failed: {result.stderr.strip()}")
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement["wall_seconds"] = wall_seconds
+    return measurement
+
+def run_startup_benchmark(repeats=5, video_count=15):
+    """Median import and wall times of no-op runs, lazy as shipped and with the heavy modules loaded up front."""
+    with tempfile.TemporaryDirectory() as scratch_directory:
+        video_ids = build_video_ids(video_count)
+        with open(os.path.join(scratch_directory, "feed.xml"), 'w') as f:
+            f.write(generate_feed_for(video_ids))
+        os.makedirs(os.path.join(scratch_directory, TEST_CHANNEL_ID))
+        for video_id in video_ids:
+            with open(os.path.join(scratch_directory, TEST_CHANNEL_ID, video_id + ".md"), 'w') as f:
+                f.write(f"# Video {video_id}\n")
+
+        results = {}
+        for mode, preload in (("lazy", ""), ("eager", EAGER_PRELOAD)):
+            measurements = [measure_no_op_run(scratch_directory, preload) for _ in range(repeats)]
+            results[mode] = {
+                "import_seconds": statistics.median(m["import_seconds"] for m in measurements),
+                "wall_seconds": statistics.median(m["wall_seconds"] for m in measurements),
+                "heavy_modules": measurements[-1]["heavy_modules"],
+            }
+
+    results["import_speedup"] = results["eager"]["import_seconds"] / results["lazy"]["import_seconds"]
+    results["wall_seconds_saved"] = results["eager"]["wall_seconds"] - results["lazy"]["wall_seconds"]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup of a run with no new videos.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run_startup_benchmark(args.repeats)
+    for mode in ("lazy", "eager"):
+        result = results[mode]
+        print(f"{mode}: imports {result['import_seconds'] * 1000:.0f}ms, wall time {result['wall_seconds'] * 1000:.0f}ms, "
+              f"heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+    print(f"Imports {results['import_speedup']:.1f}x faster, {results['wall_seconds_saved'] * 1000:.0f}ms saved per no-op run.")
+
+if __name__ == "__main__":
+    main()
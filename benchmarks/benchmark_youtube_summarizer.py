@@ -0,0 +1,152 @@
+# Offline benchmark of YoutubeSummarizer.run on feeds of growing size, built on the test fakes
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+from youtube_summarizer import YoutubeSummarizer
+from rate_limiter import RateLimiter
+from metrics import RunMetrics
+from test_youtube_summarizer import FakeSummarizer, FakeTranscription, FakeEmailService, FakeGitRepository, build_video_ids, generate_feed_for
+
+SIZES = [10, 100, 1000, 10000]
+
+class TransientError(Exception):
+    pass
+
+class FaultInjector:
+    """Sleeps for latency seconds, then fails with TransientError error_rate of the time"""
+
+    def __init__(self, latency, error_rate, seed):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def inject(self):
+        time.sleep(self.latency)
+        with self.lock:
+            failing = self.random.random() < self.error_rate
+        if failing:
+            raise TransientError("Injected error")
+
+def retrying_rate_limiter():
+    # injected errors are retried like throttling, with short delays to keep the benchmark fast
+    return RateLimiter(retry_on=(TransientError,), max_retries=10, base_delay=0.001, max_delay=0.01)
+
+class LatentTranscription(FakeTranscription):
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        super().__init__()
+        self.faults = FaultInjector(latency, error_rate, seed)
+        self.rate_limiter = retrying_rate_limiter()
+
+    def fetch(self, video_id):
+        return self.rate_limiter.call(self.__fetch, video_id)
+
+    def __fetch(self, video_id):
+        self.faults.inject()
+        return super().fetch(video_id)
+
+class LatentSummarizer(FakeSummarizer):
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        self.faults = FaultInjector(latency, error_rate, seed)
+        self.rate_limiter = retrying_rate_limiter()
+
+    def summarize_text(self, text):
+        return self.rate_limiter.call(self.__summarize_text, text)
+
+    def __summarize_text(self, text):
+        self.faults.inject()
+        return super().summarize_text(text)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run_benchmark(video_count, transcript_latency=0.001, summary_latency=0.001, error_rate=0.0, workers=4,
+                  wait_between_requests=0, seed=0):
+    """Summarize a feed of video_count new videos in a scratch folder, returning throughput, latencies and peak memory."""
+    feed = generate_feed_for(build_video_ids(video_count))
+    metrics = RunMetrics()
+    youtube_summarizer = YoutubeSummarizer(
+        LatentSummarizer(summary_latency, error_rate, seed), LatentTranscription(transcript_latency, error_rate, seed),
+        FakeEmailService(), FakeGitRepository(), wait_between_requests=wait_between_requests,
+        max_workers=workers, max_concurrent_transcripts=workers, max_concurrent_summaries=workers, metrics=metrics)
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_directory:
+        os.chdir(scratch_directory)
+        try:
+            with open("feed.xml", 'w') as f:
+                f.write(feed)
+
+            # the progress of thousands of videos would drown the results
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                tracemalloc.start()
+                start = time.perf_counter()
+                youtube_summarizer.run("feed.xml", "user@example.com", commit_summaries=True)
+                seconds = time.perf_counter() - start
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        finally:
+            os.chdir(working_directory)
+
+    video_seconds = [video["seconds"] for video in metrics.report()["videos"].values()]
+    return {
+        "videos": video_count,
+        "seconds": seconds,
+        "videos_per_second": video_count / seconds,
+        "latency_p50": percentile(video_seconds, 0.50),
+        "latency_p99": percentile(video_seconds, 0.99),
+        "peak_memory_bytes": peak_memory,
+        "transcript_retries": youtube_summarizer.transcript_service.rate_limiter.stats()["retries"],
+        "summary_retries": youtube_summarizer.summarizer.rate_limiter.stats()["retries"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YoutubeSummarizer.run offline, on feeds of growing size.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated numbers of videos")
+    parser.add_argument("--transcript-latency", type=float, default=0.001, help="seconds per transcript fetch")
+    parser.add_argument("--summary-latency", type=float, default=0.001, help="seconds per summary")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with a retried error")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--wait-between-requests", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results path, benchmarks/results/<timestamp>.json by default")
+    args = parser.parse_args()
+
+    settings = {
+        "transcript_latency": args.transcript_latency,
+        "summary_latency": args.summary_latency,
+        "error_rate": args.error_rate,
+        "workers": args.workers,
+        "wait_between_requests": args.wait_between_requests,
+        "seed": args.seed,
+    }
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        result = run_benchmark(size, **settings)
+        print(f"{size} videos: {result['videos_per_second']:.1f} videos/s, p50 {result['latency_p50'] * 1000:.1f}ms, "
+              f"p99 {result['latency_p99'] * 1000:.1f}ms, peak memory {result['peak_memory_bytes'] / 1024 / 1024:.1f}MB")
+        results.append(result)
+
+    started_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({"started_at": started_at.isoformat(), "settings": settings, "results": results}, f, indent=2)
+    print(f"Results saved to {output}")
+
+if __name__ == "__main__":
+    main()
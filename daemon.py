@@ -0,0 +1,202 @@
+# Long-running mode: polls every channel on its own schedule, reusing the same clients
+
+import heapq
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from youtube_summarizer import DEFAULT_OPTIONS, FLAG_OPTIONS, build_youtube_summarizer, parse_options, parse_positive_integer
+
+DAEMON_DEFAULT_OPTIONS = dict(DEFAULT_OPTIONS, **{"interval": 3600, "health-port": 8765})
+
+class ChannelScheduler:
+    """Priority queue of channels by due time, each polled every interval seconds, give or take jitter.
+
+    A channel that keeps failing is polled less and less often: its interval doubles with every
+    consecutive failure, up to max_backoff seconds.
+    """
+
+    def __init__(self, intervals, jitter=0.1, max_backoff=24 * 3600, clock=time.monotonic, random_generator=None):
+        self.intervals = intervals
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.random = random_generator or random.Random()
+        self.lock = threading.Lock()
+        self.queue = []
+        # keeps the order stable between channels due at the same time
+        self.sequence = itertools.count()
+        self.channels = {}
+
+        now = clock()
+        for channel in intervals:
+            self.channels[channel] = {"runs": 0, "consecutive_failures": 0, "last_run": None, "last_error": None}
+            self.__schedule(channel, now)
+
+    def next_due(self):
+        """The next channel to poll, and how long to wait until it is due."""
+        with self.lock:
+            due_time, _, channel = self.queue[0]
+            return channel, max(0, due_time - self.clock())
+
+    def record_run(self, channel, error=None):
+        """Schedule the next poll of a channel that just ran, backing off while it fails."""
+        with self.lock:
+            heapq.heappop(self.queue)
+            state = self.channels[channel]
+            state["runs"] += 1
+            state["last_run"] = time.time()
+            state["last_error"] = None if error is None else str(error)
+            state["consecutive_failures"] = 0 if error is None else state["consecutive_failures"] + 1
+
+            delay = min(self.max_backoff, self.intervals[channel] * 2 ** state["consecutive_failures"])
+            self.__schedule(channel, self.clock() + self.random.uniform(delay * (1 - self.jitter), delay * (1 + self.jitter)))
+
+    def status(self):
+        with self.lock:
+            now = self.clock()
+            next_runs = {channel: due_time - now for due_time, _, channel in self.queue}
+            return {channel: dict(state, next_run_in=max(0, next_runs[channel])) for channel, state in self.channels.items()}
+
+    def __schedule(self, channel, due_time):
+        heapq.heappush(self.queue, (due_time, next(self.sequence), channel))
+
+class Daemon:
+    """Runs each channel when it is due, until stopped, with a status endpoint on 127.0.0.1:health_port.
+
+    Stopping never interrupts a channel being summarized: the daemon exits once it is done. The metrics
+    since the daemon started are written after every channel, to report_path and metrics_textfile.
+    """
+
+    def __init__(self, youtube_summarizer, scheduler, email, commit_summaries=False, health_port=None,
+                 report_path=None, metrics_textfile=None):
+        self.youtube_summarizer = youtube_summarizer
+        self.scheduler = scheduler
+        self.email = email
+        self.commit_summaries = commit_summaries
+        self.health_port = health_port
+        self.report_path = report_path
+        self.metrics_textfile = metrics_textfile
+        self.stopping = threading.Event()
+        self.started = threading.Event()
+        self.started_at = time.time()
+        self.current_channel = None
+        self.health_server = None
+
+    def run(self):
+        if self.health_port is not None:
+            self.__start_health_server()
+        self.started.set()
+        try:
+            while not self.stopping.is_set():
+                channel, wait = self.scheduler.next_due()
+                # a stop request wakes the daemon up straight away
+                if self.stopping.wait(wait):
+                    break
+                self.__run_channel(channel)
+        finally:
+            if self.health_server is not None:
+                self.health_server.shutdown()
+                self.health_server.server_close()
+        print("Daemon stopped.")
+
+    def stop(self):
+        if not self.stopping.is_set():
+            print("Stopping once the current channel is done...")
+        self.stopping.set()
+
+    def status(self):
+        return {
+            "status": "stopping" if self.stopping.is_set() else "ok",
+            "uptime": time.time() - self.started_at,
+            "current_channel": self.current_channel,
+            "channels": self.scheduler.status(),
+        }
+
+    @property
+    def health_url(self):
+        return f"http://127.0.0.1:{self.health_server.server_address[1]}"
+
+    def __run_channel(self, channel):
+        self.current_channel = channel
+        try:
+            self.youtube_summarizer.run(channel, self.email, commit_summaries=self.commit_summaries)
+        except Exception as e:
+            print(f"Failed to summarize '{channel}': {e}")
+            self.scheduler.record_run(channel, error=e)
+        else:
+            self.scheduler.record_run(channel)
+        finally:
+            self.current_channel = None
+            self.__write_metrics()
+
+    def __write_metrics(self):
+        if self.report_path is not None:
+            self.youtube_summarizer.metrics.write_report(self.report_path)
+        if self.metrics_textfile is not None:
+            self.youtube_summarizer.metrics.write_prometheus(self.metrics_textfile)
+
+    def __start_health_server(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    status, payload = 200, {"status": daemon.status()["status"]}
+                elif self.path == "/status":
+                    status, payload = 200, daemon.status()
+                else:
+                    status, payload = 404, {"error": f"No route for {self.path}"}
+
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.health_server = ThreadingHTTPServer(("127.0.0.1", self.health_port), Handler)
+        threading.Thread(target=self.health_server.serve_forever, daemon=True).start()
+
+def parse_channel_intervals(channels_arg, default_interval):
+    """Parse 'channel[@seconds],...' into the polling interval of each channel."""
+    intervals = {}
+    for channel_spec in channels_arg.split(","):
+        channel, _, interval = channel_spec.partition("@")
+        if not channel:
+            raise RuntimeError("Invalid channel ID or file path.")
+        intervals[channel] = parse_positive_integer(interval, f"Interval of {channel}") if interval else default_interval
+    return intervals
+
+def main():
+    try:
+        options = [arg for arg in sys.argv[1:] if arg.startswith("--") and ("=" in arg or arg in FLAG_OPTIONS)]
+        args = [arg for arg in sys.argv[1:] if arg not in options]
+        if len(args) != 3 or args[2] not in ("--git-commits-on", "--git-commits-off"):
+            raise RuntimeError("Usage: python daemon.py <youtube_channel_id_or_file_path[@interval_seconds][,...]> <recipient_email> <--git-commits-on|--git-commits-off> [--interval=SECONDS] [--health-port=N] [--workers=N] [--chunk-tokens=N] [--fanout=N] [--batch] [--drop-filler] [--digest] [--metrics-textfile=PATH]")
+        options = parse_options(options, DAEMON_DEFAULT_OPTIONS)
+
+        daemon = Daemon(build_youtube_summarizer(options),
+                        ChannelScheduler(parse_channel_intervals(args[0], options["interval"])),
+                        args[1], commit_summaries=args[2] == "--git-commits-on", health_port=options["health-port"],
+                        report_path=os.path.join(".cache", "run_report.json"), metrics_textfile=options["metrics-textfile"])
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, lambda *_: daemon.stop())
+
+        print(f"Daemon started, status on http://127.0.0.1:{options['health-port']}/status")
+        daemon.run()
+
+    except Exception as e:
+        sys.stderr.write(f"Unexpected error: {e}\n")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# Email delivery: a persistent outbox, sent over one reused SMTP connection at the end of a run
+
+import json
+import os
+import smtplib
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+from rate_limiter import RateLimiter
+
+# failures worth retrying on a new connection, unlike refused recipients or authentication errors
+SMTP_TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+def smtp_rate_limiter():
+    return RateLimiter(max_retries=3, base_delay=2, max_delay=60, retry_on=SMTP_TRANSIENT_ERRORS)
+
+class SmtpSender:
+    """Sends HTML emails over a single SMTP connection, opened by the first email and reused by the next ones.
+
+    A failed email drops the connection, so that its retry, and the next email, log in again.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, timeout=30, rate_limiter=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or smtp_rate_limiter()
+        self.connection = None
+        self.connections = 0
+
+    def send(self, to, subject, body):
+        message = EmailMessage()
+        message["From"] = self.username or f"youtube-summarizer@{self.host}"
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body, subtype="html")
+        self.rate_limiter.call(self.__send, message)
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.quit()
+        except OSError:
+            # SMTPException included, the emails were sent already
+            pass
+        self.connection = None
+
+    def __send(self, message):
+        try:
+            self.__connect().send_message(message)
+        except Exception:
+            self.__drop_connection()
+            raise
+
+    def __connect(self):
+        if self.connection is None:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            connection = smtp_class(self.host, self.port, timeout=self.timeout)
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+            self.connection = connection
+            self.connections += 1
+        return self.connection
+
+    def __drop_connection(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class EmailOutbox:
+    """Queue of emails in directory, one JSON file each, delivered through sender by deliver().
+
+    send() only queues the email, so that a slow or failing SMTP server does not hold up the run. An email
+    is removed from the queue once sent: those that failed stay queued for the next delivery. With a
+    digest_subject, such as "{count} channels", the emails queued for the same recipient are merged into one.
+    """
+
+    def __init__(self, directory, sender, digest_subject=None):
+        self.directory = directory
+        self.sender = sender
+        self.digest_subject = digest_subject
+        self.lock = threading.Lock()
+
+    def send(self, to, subject, body):
+        os.makedirs(self.directory, exist_ok=True)
+        # names sort in queueing order
+        path = os.path.join(self.directory, f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json")
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"to": to, "subject": subject, "body": body}, f)
+        os.replace(temp_path, path)
+
+    def pending(self):
+        """The queued emails, oldest first, with the path of their file."""
+        if not os.path.isdir(self.directory):
+            return []
+        emails = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                with open(path, 'r') as f:
+                    emails.append((path, json.load(f)))
+        return emails
+
+    def deliver(self):
+        """Send the queued emails, returning how many were delivered."""
+        with self.lock:
+            recipients = {}
+            for path, email in self.pending():
+                recipients.setdefault(email["to"], []).append((path, email))
+            if not recipients:
+                return 0
+
+            delivered = 0
+            failures = 0
+            try:
+                for to, emails in recipients.items():
+                    for paths, subject, body in self.__messages(emails):
+                        try:
+                            self.sender.send(to, subject, body)
+                        except Exception as e:
+                            print(f"Failed to deliver '{subject}' to {to}, it stays in the outbox: {e}")
+                            failures += len(paths)
+                            continue
+                        for path in paths:
+                            os.remove(path)
+                        delivered += len(paths)
+            finally:
+                self.sender.close()
+
+            print(f"Delivered {delivered} emails" + (f", {failures} still in the outbox." if failures else "."))
+            return delivered
+
+    def __messages(self, emails):
+        if self.digest_subject is None or len(emails) == 1:
+            return [([path], email["subject"], email["body"]) for path, email in emails]
+
+        body = "\n<hr>\n".join(email["body"] for _, email in emails)
+        return [([path for path, _ in emails], self.digest_subject.format(count=len(emails)), body)]
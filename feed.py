@@ -0,0 +1,152 @@
+# Fetching and streaming parsing of YouTube channel RSS feeds
+
+import io
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+import requests
+
+YT = "{http://www.youtube.com/xml/schemas/2015}"
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+def channel_rss_url(channel_id):
+    return f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+
+class FeedFetcher:
+    """Fetches channel feeds through a pooled HTTP session, with conditional requests.
+
+    The ETag and Last-Modified validators of a feed are only saved (to validators_path) once its
+    videos were processed, so that a failed run fetches the whole feed again next time.
+    """
+
+    def __init__(self, validators_path=None, session=None, timeout=30):
+        self.validators_path = validators_path
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.validators = self.__load_validators()
+        self.fetched_validators = {}
+
+    def fetch(self, channel_id):
+        """Return the feed as a binary file, or None if it did not change since its validators were saved."""
+        headers = {}
+        validators = self.validators.get(channel_id, {})
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        resp = self.session.get(channel_rss_url(channel_id), headers=headers, timeout=self.timeout)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+
+        with self.lock:
+            self.fetched_validators[channel_id] = {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified")
+            }
+        return io.BytesIO(resp.content)
+
+    def save_validators(self, channel_id):
+        """Remember the validators of the last fetched feed of the channel, once it was processed."""
+        with self.lock:
+            if channel_id not in self.fetched_validators:
+                return
+            self.validators[channel_id] = self.fetched_validators.pop(channel_id)
+            if self.validators_path is None:
+                return
+
+            if os.path.dirname(self.validators_path):
+                os.makedirs(os.path.dirname(self.validators_path), exist_ok=True)
+            temp_path = self.validators_path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.validators, f)
+            os.replace(temp_path, self.validators_path)
+
+    def __load_validators(self):
+        if self.validators_path is None or not os.path.exists(self.validators_path):
+            return {}
+        with open(self.validators_path, 'r') as f:
+            return json.load(f)
+
+class ChannelFeed:
+    """Reads a channel RSS feed from a binary file, one entry at a time.
+
+    The channel ID and title are read as soon as the feed is opened. Iterating yields the video
+    infos in feed order, clearing every parsed entry, so that memory stays flat whatever the size
+    of the feed, and nothing after the last requested entry is read.
+    """
+
+    def __init__(self, feed_file):
+        self.feed_file = feed_file
+        self.events = ET.iterparse(feed_file, events=("start", "end"))
+        self.root = None
+        self.depth = 0
+        self.pending_entry = False
+        self.channel_id = None
+        self.title = None
+        self.__read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.feed_file.close()
+
+    def __iter__(self):
+        if not self.pending_entry:
+            return
+        for event, elem in self.__parse():
+            if event == "end" and self.depth == 1 and elem.tag == ATOM + "entry":
+                yield self.__video_info(elem)
+                # drop the entries parsed so far
+                self.root.clear()
+
+    def __read_header(self):
+        for event, elem in self.__parse():
+            if event == "start" and self.depth == 2 and elem.tag == ATOM + "entry":
+                # channel details come before the entries
+                self.pending_entry = True
+                break
+            if event == "end" and self.depth == 1:
+                if elem.tag == YT + "channelId":
+                    self.channel_id = "UC" + elem.text
+                elif elem.tag == ATOM + "title":
+                    self.title = elem.text
+
+        if self.channel_id is None:
+            raise RuntimeError("Failed to parse RSS feed XML: No channelId found in RSS feed.")
+
+    def __parse(self):
+        """Iterate over parsing events, keeping track of the depth of the current element."""
+        try:
+            for event, elem in self.events:
+                if event == "start":
+                    self.depth += 1
+                    if self.root is None:
+                        self.root = elem
+                else:
+                    self.depth -= 1
+                yield event, elem
+        except ET.ParseError as e:
+            raise RuntimeError(f"Failed to parse RSS feed XML: {e}")
+
+    def __video_info(self, entry):
+        video_id = self.__child_text(entry, YT + "videoId", "videoId")
+        return {
+            "id": video_id,
+            "title": self.__child_text(entry, ATOM + "title", "title"),
+            "published": self.__child_text(entry, ATOM + "published", "published"),
+            "url": f"https://www.youtube.com/watch?v={video_id}"
+        }
+
+    def __child_text(self, entry, tag, name):
+        child = entry.find(tag)
+        if child is None:
+            raise RuntimeError(f"Failed to parse RSS feed XML: No {name} found in entry.")
+        return child.text
@@ -0,0 +1,62 @@
+# Persistence of the summaries in git: bulk staging, one commit per batch, push with rebase and retry
+
+import subprocess
+
+class GitError(RuntimeError):
+    pass
+
+class GitRepository:
+    """Commits folders of summaries in the repository at path, and pushes them to its upstream.
+
+    Staging and committing are limited to the given folders, so that their cost does not grow with the
+    rest of the repository. A push rejected because the remote moved on is rebased and retried, up to
+    max_push_attempts times.
+    """
+
+    def __init__(self, path=".", max_push_attempts=3):
+        self.path = path
+        self.max_push_attempts = max_push_attempts
+
+    def commit(self, folder_paths, commit_message):
+        """Stage the folders in bulk and commit them together, returning False if nothing changed."""
+        if isinstance(folder_paths, str):
+            folder_paths = [folder_paths]
+
+        self.__git("add", "--all", "--", *folder_paths)
+        result = self.__git("commit", "--quiet", "--no-verify", "-m", commit_message, "--", *folder_paths, check=False)
+        if result.returncode != 0:
+            if "nothing to commit" in result.stdout + result.stderr or "no changes added" in result.stdout + result.stderr:
+                return False
+            raise GitError(f"git commit failed: {result.stderr.strip() or result.stdout.strip()}")
+        return True
+
+    def push(self):
+        """Push to the upstream branch, rebasing on what others pushed in the meantime."""
+        for attempt in range(1, self.max_push_attempts + 1):
+            result = self.__git("push", "--quiet", check=False)
+            if result.returncode == 0:
+                return
+            if attempt == self.max_push_attempts:
+                raise GitError(f"git push failed after {attempt} attempts: {result.stderr.strip()}")
+
+            print(f"Push rejected, rebasing on the remote (attempt {attempt} of {self.max_push_attempts})...")
+            rebase = self.__git("pull", "--rebase", "--quiet", check=False)
+            if rebase.returncode != 0:
+                self.__git("rebase", "--abort", check=False)
+                raise GitError(f"git pull --rebase failed: {rebase.stderr.strip()}")
+
+    def commit_and_push(self, folder_paths, commit_message):
+        """Commit and push one folder, or a list of folders in a single commit."""
+        try:
+            if self.commit(folder_paths, commit_message):
+                self.push()
+            return True
+        except GitError as e:
+            print(f"Git operation failed: {e}")
+            return False
+
+    def __git(self, *args, check=True):
+        result = subprocess.run(["git", "-C", self.path, *args], capture_output=True, text=True)
+        if check and result.returncode != 0:
+            raise GitError(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result
@@ -0,0 +1,63 @@
+# Write-ahead journal of the videos of a run, to resume it where it stopped
+
+import json
+import os
+import re
+import threading
+
+FETCHED = "fetched"
+SUMMARIZED = "summarized"
+WRITTEN = "written"
+EMAILED = "emailed"
+
+# committed videos are done, and leave the journal
+STAGES = [FETCHED, SUMMARIZED, WRITTEN, EMAILED]
+
+def reached(entry, stage):
+    return STAGES.index(entry["stage"]) >= STAGES.index(stage)
+
+class RunJournal:
+    """One append-only JSON lines file per channel (or feed file), recording every stage each video went through.
+
+    Every record is flushed to disk before the run moves on, so that a failed run can be resumed without
+    summarizing again, and still emails and commits what was done. A journal is cleared once its videos
+    were committed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def record(self, key, video_id, stage, **fields):
+        line = json.dumps({"video_id": video_id, "stage": stage, **fields})
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.__path(key), 'a') as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def entries(self, key):
+        """Latest stage and fields of every video of the journal, in the order they were first recorded."""
+        path = self.__path(key)
+        if not os.path.exists(path):
+            return {}
+
+        entries = {}
+        with self.lock, open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last record of a crashed run may be cut short
+                    continue
+                entries.setdefault(record["video_id"], {}).update(record)
+        return entries
+
+    def clear(self, key):
+        with self.lock:
+            if os.path.exists(self.__path(key)):
+                os.remove(self.__path(key))
+
+    def __path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_-]', '_', key) + ".jsonl")
@@ -0,0 +1,30 @@
+# Services built on first use, so that runs with nothing new to summarize skip their imports and setup
+
+import threading
+
+class LazyService:
+    """Stands in for the service returned by factory, calling it the first time one of its attributes is used.
+
+    Heavy clients (OpenAI, SQLite caches, YouTube) are only needed once a run found new videos: with a
+    LazyService, a run that stops at the feed never imports nor builds them.
+    """
+
+    def __init__(self, factory):
+        self.__factory = factory
+        self.__service = None
+        self.__lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        return self.__service is not None
+
+    def __getattr__(self, name):
+        # only called for the attributes of the service, as the proxy's own are found first
+        return getattr(self.__built_service(), name)
+
+    def __built_service(self):
+        if self.__service is None:
+            with self.__lock:
+                if self.__service is None:
+                    self.__service = self.__factory()
+        return self.__service
@@ -0,0 +1,54 @@
+# Summary of the summaries of a run, reduced as a tree so that it scales with the number of videos
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from transcript_chunker import estimate_tokens
+
+SEPARATOR = "\n\n"
+
+class TreeSummarizer:
+    """Summarizes any number of summaries with prompts of at most max_tokens.
+
+    The summaries are grouped in the order they come, as many per prompt as fit, and every group is
+    summarized, at most max_in_flight at a time. The summaries of the groups are then reduced the same
+    way, until a single one is left. The summaries can be a generator: only the groups being summarized,
+    and the summaries of the groups, are kept in memory.
+    """
+
+    def __init__(self, summarize, max_tokens, max_in_flight=4):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.max_in_flight = max_in_flight
+
+    def summarize_all(self, summaries):
+        level = self.__summarize_groups(summaries)
+        while len(level) > 1:
+            level = self.__summarize_groups(level)
+        return level[0] if level else None
+
+    def __summarize_groups(self, summaries):
+        # submitting the groups as they are read, without reading further than the requests in flight
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for group in self.__groups(summaries):
+                slots.acquire()
+                future = executor.submit(self.summarize, SEPARATOR.join(group).strip())
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+        return [future.result() for future in futures]
+
+    def __groups(self, summaries):
+        # groups have at least 2 summaries, so that every level makes progress
+        group = []
+        group_tokens = 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary + SEPARATOR)
+            if len(group) >= 2 and group_tokens + tokens > self.max_tokens:
+                yield group
+                group = []
+                group_tokens = 0
+            group.append(summary)
+            group_tokens += tokens
+        if group:
+            yield group
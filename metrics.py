@@ -0,0 +1,92 @@
+# Per-stage and per-video instrumentation of a run, reported as JSON and as a Prometheus textfile
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class RunMetrics:
+    """Collects the wall time of every stage, and counters (bytes, tokens, cost, retries, cache hits...) by video.
+
+    Counters recorded without a video, like the bytes of a feed, only count towards the run totals.
+    """
+
+    def __init__(self, clock=time.perf_counter, wall_clock=time.time):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.lock = threading.Lock()
+        self.started_at = wall_clock()
+        self.start = clock()
+        self.stages = {}
+        self.videos = {}
+        self.totals = {}
+
+    @contextmanager
+    def stage(self, name, video_id=None):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            seconds = self.clock() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+                stage["count"] += 1
+                stage["seconds"] += seconds
+                if video_id is not None:
+                    video = self.__video(video_id)
+                    video["seconds"] += seconds
+                    video["stages"][name] = video["stages"].get(name, 0.0) + seconds
+
+    def add(self, video_id=None, **counters):
+        with self.lock:
+            for name, value in counters.items():
+                self.totals[name] = self.totals.get(name, 0) + value
+                if video_id is not None:
+                    video = self.__video(video_id)
+                    video[name] = video.get(name, 0) + value
+
+    def report(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "seconds": self.clock() - self.start,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "videos": {video_id: dict(video, stages=dict(video["stages"])) for video_id, video in self.videos.items()},
+                "totals": dict(self.totals),
+            }
+
+    def write_report(self, path):
+        self.__write_atomically(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path):
+        """Write the run in the Prometheus text format, for the node exporter's textfile collector."""
+        report = self.report()
+        lines = [
+            "# TYPE youtube_summarizer_last_run_timestamp_seconds gauge",
+            f"youtube_summarizer_last_run_timestamp_seconds {report['started_at']}",
+            "# TYPE youtube_summarizer_run_seconds gauge",
+            f"youtube_summarizer_run_seconds {report['seconds']}",
+            "# TYPE youtube_summarizer_videos gauge",
+            f"youtube_summarizer_videos {len(report['videos'])}",
+            "# TYPE youtube_summarizer_stage_seconds gauge",
+        ]
+        lines += [f'youtube_summarizer_stage_seconds{{stage="{name}"}} {stage["seconds"]}' for name, stage in report["stages"].items()]
+        lines.append("# TYPE youtube_summarizer_stage_runs gauge")
+        lines += [f'youtube_summarizer_stage_runs{{stage="{name}"}} {stage["count"]}' for name, stage in report["stages"].items()]
+        for name, value in sorted(report["totals"].items()):
+            lines.append(f"# TYPE youtube_summarizer_{name} gauge")
+            lines.append(f"youtube_summarizer_{name} {value}")
+        self.__write_atomically(path, "\n".join(lines) + "\n")
+
+    def __video(self, video_id):
+        return self.videos.setdefault(video_id, {"seconds": 0.0, "stages": {}})
+
+    def __write_atomically(self, path, content):
+        # a collector must never read a half written file
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            f.write(content)
+        os.replace(temp_path, path)
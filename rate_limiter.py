@@ -0,0 +1,166 @@
+# Rate limiting for the upstream services (YouTube transcripts, OpenAI)
+
+import json
+import os
+import random
+import threading
+import time
+
+class SystemClock:
+    def now(self):
+        # wall clock time, so that an open circuit can be persisted across runs
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class RateLimiter:
+    """Token bucket pacing, with exponential backoff on transient errors and a circuit breaker on bans.
+
+    rate is the number of requests per second (None for no pacing), burst the number of requests
+    that can go through without waiting. Exceptions in retry_on are retried with backoff. Exceptions
+    in ban_on are never retried: ban_threshold consecutive bans open the circuit for ban_cooldown
+    seconds, during which calls fail fast with CircuitOpenError. When state_path is given, the open
+    circuit is saved there, so that the next runs respect the cooldown too.
+    """
+
+    def __init__(self, rate=None, burst=1, max_retries=3, base_delay=1, max_delay=60,
+                 retry_on=(), ban_on=(), ban_threshold=3, ban_cooldown=3600,
+                 clock=None, random_generator=None, state_path=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = tuple(retry_on)
+        self.ban_on = tuple(ban_on)
+        self.ban_threshold = ban_threshold
+        self.ban_cooldown = ban_cooldown
+        self.clock = clock or SystemClock()
+        self.random = random_generator or random.Random()
+        self.state_path = state_path
+
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.last_refill = self.clock.now()
+        self.circuit_open_until = self.__load_circuit_open_until()
+        # a circuit opened by a previous run stays half open: the next ban re-opens it
+        self.consecutive_bans = 0 if self.circuit_open_until is None else ban_threshold
+
+        self.waited = 0.0
+        self.retries = 0
+        self.bans = 0
+        self.calls = threading.local()
+
+    def acquire(self):
+        """Wait for a token, returning how long it waited."""
+        if self.rate is None:
+            return 0
+
+        with self.lock:
+            self.__refill()
+            # tokens go negative when callers queue up, so that each one waits for its own token
+            self.tokens -= 1
+            wait = max(0, -self.tokens / self.rate)
+
+        self.__sleep(wait)
+        return wait
+
+    def call(self, function, *args, **kwargs):
+        """Call function once a token is available, retrying it on throttling or transient errors."""
+        attempt = 0
+        self.calls.retries = 0
+        while True:
+            self.__check_circuit()
+            self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except self.ban_on as e:
+                # another request would only extend the ban
+                self.__record_ban(e)
+                raise
+            except self.retry_on as e:
+                error = e
+            else:
+                with self.lock:
+                    self.consecutive_bans = 0
+                return result
+
+            if attempt >= self.max_retries:
+                raise error
+
+            delay = self.__backoff_delay(attempt)
+            print(f"Request failed ({error.__class__.__name__}), retrying in {delay:.1f}s...")
+            with self.lock:
+                self.retries += 1
+            self.calls.retries += 1
+            self.__sleep(delay)
+            attempt += 1
+
+    def last_call_retries(self):
+        """Retries of the last call made by the current thread."""
+        return getattr(self.calls, "retries", 0)
+
+    def stats(self):
+        with self.lock:
+            return {"waited": self.waited, "retries": self.retries, "bans": self.bans}
+
+    def __refill(self):
+        now = self.clock.now()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def __backoff_delay(self, attempt):
+        """Exponential backoff with 'equal jitter': at least half the delay, plus a random other half."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + self.random.uniform(0, delay / 2)
+
+    def __record_ban(self, error):
+        with self.lock:
+            self.bans += 1
+            self.consecutive_bans += 1
+            if self.consecutive_bans < self.ban_threshold:
+                return
+            self.circuit_open_until = self.clock.now() + self.ban_cooldown
+            self.__save_circuit_open_until()
+
+        raise CircuitOpenError(f"Circuit opened after {self.consecutive_bans} consecutive bans: {error}") from error
+
+    def __check_circuit(self):
+        with self.lock:
+            if self.circuit_open_until is None:
+                return
+            remaining = self.circuit_open_until - self.clock.now()
+            if remaining <= 0:
+                # half open: let one call through, a new ban re-opens the circuit straight away
+                self.circuit_open_until = None
+                self.__save_circuit_open_until()
+                return
+
+        raise CircuitOpenError(f"Circuit is open after repeated bans, retry in {remaining:.0f}s.")
+
+    def __load_circuit_open_until(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, 'r') as f:
+            return json.load(f).get("circuit_open_until")
+
+    def __save_circuit_open_until(self):
+        if self.state_path is None:
+            return
+        if os.path.dirname(self.state_path):
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"circuit_open_until": self.circuit_open_until}, f)
+        os.replace(temp_path, self.state_path)
+
+    def __sleep(self, seconds):
+        if seconds <= 0:
+            return
+        self.clock.sleep(seconds)
+        with self.lock:
+            self.waited += seconds
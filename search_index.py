@@ -0,0 +1,223 @@
+# Full-text search over the <channel_id>/<video_id>.md summaries, with a SQLite FTS5 inverted index
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+# bumped whenever the schema or the parsing of summaries changes, so that old indexes get rebuilt
+SCHEMA_VERSION = 1
+# bm25 weights of the title, body and published columns: a match in the title counts most
+COLUMN_WEIGHTS = (10.0, 1.0, 2.0)
+PUBLISHED = re.compile(r'^\*Published on (.*) at (\S+)\*$', re.MULTILINE)
+
+def parse_summary(markdown):
+    """Title, body, published date and URL of a summary written by YoutubeSummarizer."""
+    first_line, _, rest = markdown.partition("\n")
+    title = first_line.lstrip("# ").strip()
+    published, url = "", ""
+    match = PUBLISHED.search(rest)
+    if match:
+        published, url = match.groups()
+        rest = rest[:match.start()] + rest[match.end():]
+    return title, rest.strip(), published, url
+
+def fts_query(query):
+    """Match all the words of a query typed by a user, whatever its punctuation."""
+    words = re.findall(r'\w+', query)
+    return " ".join(f'"{word}"' for word in words)
+
+class SearchIndex:
+    """SQLite FTS5 index of the title, body and published date of every summary, ranked with bm25.
+
+    Like the StateStore, the index can always be rebuilt from the channel folders. Runs add the summaries
+    they write, and update() catches up with the folders changed since, comparing modification times.
+    needs_rebuild tells whether the index is missing, or was built by an older version.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+        self.needs_rebuild = self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION
+        with self.connection:
+            if self.needs_rebuild:
+                self.connection.executescript("""
+                    DROP TABLE IF EXISTS summaries;
+                    DROP TABLE IF EXISTS summaries_fts;
+                    DROP TABLE IF EXISTS folders;""")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id INTEGER PRIMARY KEY,
+                    channel_id TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    published TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    mtime REAL,
+                    UNIQUE (channel_id, video_id)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(title, body, published, tokenize='porter unicode61');
+                CREATE TABLE IF NOT EXISTS folders (
+                    channel_id TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL
+                );""")
+
+    def add(self, channel_id, video_id, markdown, mtime=None):
+        """Index a summary, replacing the one already indexed for the video."""
+        title, body, published, url = parse_summary(markdown)
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT id FROM summaries WHERE channel_id = ? AND video_id = ?", (channel_id, video_id)).fetchone()
+            if row is None:
+                summary_id = self.connection.execute(
+                    "INSERT INTO summaries (channel_id, video_id, title, published, url, mtime) VALUES (?, ?, ?, ?, ?, ?)",
+                    (channel_id, video_id, title, published, url, mtime)).lastrowid
+            else:
+                summary_id = row[0]
+                self.connection.execute("DELETE FROM summaries_fts WHERE rowid = ?", (summary_id,))
+                self.connection.execute(
+                    "UPDATE summaries SET title = ?, published = ?, url = ?, mtime = ? WHERE id = ?",
+                    (title, published, url, mtime, summary_id))
+            self.connection.execute(
+                "INSERT INTO summaries_fts (rowid, title, body, published) VALUES (?, ?, ?, ?)",
+                (summary_id, title, body, published))
+
+    def remove(self, channel_id, video_id):
+        with self.lock, self.connection:
+            self.__remove(channel_id, video_id)
+
+    def search(self, query, limit=10):
+        """The summaries matching all the words of query, best first."""
+        match = fts_query(query)
+        if not match:
+            return []
+        with self.lock:
+            cursor = self.connection.execute(f"""
+                SELECT s.channel_id, s.video_id, s.title, s.published, s.url,
+                       snippet(summaries_fts, 1, '**', '**', '…', 16) AS snippet,
+                       bm25(summaries_fts, {', '.join(str(weight) for weight in COLUMN_WEIGHTS)}) AS score
+                FROM summaries_fts JOIN summaries s ON s.id = summaries_fts.rowid
+                WHERE summaries_fts MATCH ?
+                ORDER BY score
+                LIMIT ?""", (match, limit))
+            columns = [column[0] for column in cursor.description]
+            # bm25 scores are negative, the lower the better
+            return [dict(zip(columns, row), score=-row[-1]) for row in cursor]
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def index_channel_folder(self, channel_id, root="."):
+        """Index the summaries of a channel folder added or modified since they were indexed, and drop the removed ones."""
+        folder = os.path.join(root, channel_id)
+        files = {}
+        folder_mtime = None
+        if os.path.isdir(folder):
+            folder_mtime = os.stat(folder).st_mtime
+            files = {entry.name[:-len(".md")]: (entry.path, entry.stat().st_mtime)
+                     for entry in os.scandir(folder) if entry.name.endswith(".md")}
+
+        with self.lock:
+            indexed = dict(self.connection.execute(
+                "SELECT video_id, mtime FROM summaries WHERE channel_id = ?", (channel_id,)))
+        with self.lock, self.connection:
+            for video_id in indexed.keys() - files.keys():
+                self.__remove(channel_id, video_id)
+
+        updated = 0
+        for video_id, (path, mtime) in files.items():
+            if indexed.get(video_id) != mtime:
+                with open(path, 'r') as f:
+                    self.add(channel_id, video_id, f.read(), mtime)
+                updated += 1
+
+        with self.lock, self.connection:
+            if folder_mtime is None:
+                self.connection.execute("DELETE FROM folders WHERE channel_id = ?", (channel_id,))
+            else:
+                self.connection.execute("INSERT OR REPLACE INTO folders (channel_id, mtime) VALUES (?, ?)", (channel_id, folder_mtime))
+        return updated
+
+    def update(self, root="."):
+        """Index the channel folders of root changed since the last update, returning how many summaries were indexed.
+
+        Only the folders are checked for changes: a summary file rewritten in place is picked up by the
+        run writing it, or by rebuild().
+        """
+        with self.lock:
+            folder_mtimes = dict(self.connection.execute("SELECT channel_id, mtime FROM folders"))
+            indexed_channel_ids = {row[0] for row in self.connection.execute("SELECT DISTINCT channel_id FROM summaries")}
+
+        channel_ids = set()
+        updated = 0
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.name.startswith("UC") and len(entry.name) == 24:
+                channel_ids.add(entry.name)
+                if folder_mtimes.get(entry.name) != entry.stat().st_mtime:
+                    updated += self.index_channel_folder(entry.name, root)
+
+        for channel_id in (indexed_channel_ids | folder_mtimes.keys()) - channel_ids:
+            self.index_channel_folder(channel_id, root)
+        return updated
+
+    def rebuild(self, root="."):
+        """Index all the channel folders found in root from scratch."""
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                DELETE FROM summaries;
+                DELETE FROM summaries_fts;
+                DELETE FROM folders;""")
+        indexed = self.update(root)
+        with self.lock, self.connection:
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.needs_rebuild = False
+        return indexed
+
+    def close(self):
+        self.connection.close()
+
+    def __remove(self, channel_id, video_id):
+        row = self.connection.execute(
+            "SELECT id FROM summaries WHERE channel_id = ? AND video_id = ?", (channel_id, video_id)).fetchone()
+        if row is not None:
+            self.connection.execute("DELETE FROM summaries_fts WHERE rowid = ?", row)
+            self.connection.execute("DELETE FROM summaries WHERE id = ?", row)
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    limit = 10
+    rebuild = False
+    for option in options:
+        if option == "--rebuild":
+            rebuild = True
+        elif option.startswith("--limit="):
+            limit = int(option[len("--limit="):])
+        else:
+            sys.exit(f"Unknown option: '{option}'")
+    if not args and not rebuild:
+        sys.exit("Usage: python search_index.py [--rebuild] [--limit=N] <query>")
+
+    search_index = SearchIndex(os.path.join(".cache", "search.sqlite"))
+    if rebuild or search_index.needs_rebuild:
+        print(f"Indexed {search_index.rebuild()} summaries.")
+    else:
+        search_index.update()
+
+    if args:
+        start = time.perf_counter()
+        results = search_index.search(" ".join(args), limit=limit)
+        milliseconds = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(f"{result['title']} ({result['published']})\n  {result['url']}\n  {result['channel_id']}/{result['video_id']}.md: {result['snippet']}\n")
+        print(f"{len(results)} results in {milliseconds:.1f}ms, out of {search_index.count()} summaries.")
+    search_index.close()
+
+if __name__ == "__main__":
+    main()
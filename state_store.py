@@ -0,0 +1,121 @@
+# Index of the state of every video, next to the <channel_id>/<video_id>.md summaries
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+IN_PROGRESS = "in_progress"
+SUMMARIZED = "summarized"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+class StateStore:
+    """SQLite index of videos keyed by (channel_id, video_id), with their status, timestamps, hashes and costs.
+
+    The markdown summaries stay the published artifact: the index can always be rebuilt from the
+    channel folders, and is kept in sync with them on every run.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    channel_id TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    transcript_hash TEXT,
+                    summary_hash TEXT,
+                    cost REAL,
+                    error TEXT,
+                    PRIMARY KEY (channel_id, video_id)
+                )""")
+
+    def mark(self, channel_id, video_id, status, transcript_hash=None, summary_hash=None, cost=None, error=None):
+        """Record the status of a video, keeping the hashes and cost already known when not given."""
+        now = self.clock()
+        with self.lock, self.connection:
+            self.connection.execute("""
+                INSERT INTO videos (channel_id, video_id, status, created_at, updated_at, transcript_hash, summary_hash, cost, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (channel_id, video_id) DO UPDATE SET
+                    status = excluded.status,
+                    updated_at = excluded.updated_at,
+                    transcript_hash = COALESCE(excluded.transcript_hash, transcript_hash),
+                    summary_hash = COALESCE(excluded.summary_hash, summary_hash),
+                    cost = COALESCE(excluded.cost, cost),
+                    error = excluded.error""",
+                (channel_id, video_id, status, now, now, transcript_hash, summary_hash, cost, error))
+
+    def video(self, channel_id, video_id):
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT * FROM videos WHERE channel_id = ? AND video_id = ?", (channel_id, video_id))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([column[0] for column in cursor.description], row))
+
+    def video_ids(self, channel_id, status):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT video_id FROM videos WHERE channel_id = ? AND status = ?", (channel_id, status))
+            return {row[0] for row in rows}
+
+    def summarized_video_ids(self, channel_id):
+        return self.video_ids(channel_id, SUMMARIZED)
+
+    def import_channel_folder(self, channel_id, root="."):
+        """Sync the channel with its folder in a single directory scan.
+
+        Every <video_id>.md summary is marked as summarized, and summarized videos without a file anymore
+        are marked as failed, so that they get summarized again.
+        """
+        folder = os.path.join(root, channel_id)
+        video_ids = set()
+        if os.path.isdir(folder):
+            video_ids = {entry.name[:-len(".md")] for entry in os.scandir(folder) if entry.name.endswith(".md")}
+
+        missing_video_ids = self.summarized_video_ids(channel_id) - video_ids
+        now = self.clock()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE videos SET status = ?, updated_at = ?, error = ? WHERE channel_id = ? AND video_id = ?",
+                [(FAILED, now, "Summary file is missing.", channel_id, video_id) for video_id in missing_video_ids])
+            self.connection.executemany("""
+                INSERT INTO videos (channel_id, video_id, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (channel_id, video_id) DO UPDATE SET
+                    status = excluded.status,
+                    updated_at = excluded.updated_at,
+                    error = NULL
+                WHERE status != excluded.status""",
+                [(channel_id, video_id, SUMMARIZED, now, now) for video_id in video_ids])
+        return len(video_ids)
+
+    def import_folders(self, root="."):
+        """Build the index from all the channel folders found in root."""
+        imported = 0
+        for entry in os.scandir(root):
+            if entry.is_dir() and entry.name.startswith("UC") and len(entry.name) == 24:
+                imported += self.import_channel_folder(entry.name, root)
+        return imported
+
+    def close(self):
+        self.connection.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python state_store.py <state_store_path>")
+    state_store = StateStore(sys.argv[1])
+    print(f"Imported {state_store.import_folders()} summaries.")
+    state_store.close()
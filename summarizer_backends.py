@@ -0,0 +1,144 @@
+# Summarization backends: OpenAI compatible endpoints, and hedged requests between two of them for tail latency
+
+import asyncio
+import openai
+import threading
+import time
+from collections import deque
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+class OpenAIBackend:
+    """A model behind an OpenAI compatible Responses API: OpenAI itself, another endpoint, or a local model server.
+
+    Requests are made with an async client, on the event loop of the HedgedBackend using it, so that a
+    request losing the race can be cancelled. Retries are left to the summarizer's rate limiter.
+    """
+
+    def __init__(self, name, api_key, base_url=None, model=None):
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        # the summarizer's model when None
+        self.model = model
+        # built up front, as setting up its TLS context would hold up the event loop of the race
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def create(self, model, input):
+        return await self.client.responses.create(model=self.model or model, input=input)
+
+class HedgedBackend:
+    """Sends every request to primary, and a duplicate to secondary when primary has not answered in time.
+
+    The first answer wins, and the other request is cancelled. Primary gets the hedge_percentile of its last
+    window latencies to answer, or initial_hedge_delay until it answered min_samples requests: about
+    1 - hedge_percentile of the requests are hedged. A request failing on primary fails over to secondary
+    straight away. Each request fails with TimeoutError after deadline seconds, on both backends. Without
+    secondary, requests only get the deadline.
+    """
+
+    def __init__(self, primary, secondary=None, hedge_percentile=0.95, deadline=120, initial_hedge_delay=10, min_samples=20, window=200):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_percentile = hedge_percentile
+        self.deadline = deadline
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.primary_latencies = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.cancelled = 0
+        self.wins = {backend.name: 0 for backend in (primary, secondary) if backend is not None}
+        self.calls = threading.local()
+        self.loop = None
+
+    def create(self, model, input):
+        """Same as client.responses.create, from any thread."""
+        self.calls.hedged = False
+        future = asyncio.run_coroutine_threadsafe(asyncio.wait_for(self.__race(model, input), self.deadline), self.__event_loop())
+        response, self.calls.hedged = future.result()
+        return response
+
+    def last_call_hedged(self):
+        """Whether the last request of the current thread was sent to both backends."""
+        return getattr(self.calls, "hedged", False)
+
+    def hedge_delay(self):
+        with self.lock:
+            if len(self.primary_latencies) < self.min_samples:
+                return self.initial_hedge_delay
+            return percentile(self.primary_latencies, self.hedge_percentile)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "failovers": self.failovers,
+                "cancelled": self.cancelled,
+                "wins": dict(self.wins),
+                "latency_p50": percentile(self.latencies, 0.50),
+                "latency_p99": percentile(self.latencies, 0.99),
+                "hedge_delay": self.hedge_delay() if self.secondary is not None else None,
+            }
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+
+    async def __race(self, model, input):
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self.primary.create(model, input))
+        attempts = {primary: self.primary}
+        hedged = False
+        failed_over = False
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay() if self.secondary is not None else None)
+            if self.secondary is not None and (not done or primary.exception() is not None):
+                hedged = not done
+                failed_over = bool(done)
+                attempts[asyncio.ensure_future(self.secondary.create(model, input))] = self.secondary
+
+            errors = []
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is not None:
+                        errors.append(attempt.exception())
+                        continue
+                    self.__record(attempts[attempt], time.monotonic() - start, hedged, failed_over)
+                    return attempt.result(), hedged
+            raise errors[0]
+        finally:
+            losers = [attempt for attempt in attempts if not attempt.done()]
+            with self.lock:
+                if not primary.done():
+                    self.primary_latencies.append(time.monotonic() - start)
+                self.cancelled += len(losers)
+            for attempt in losers:
+                attempt.cancel()
+
+    def __record(self, winner, latency, hedged, failed_over):
+        with self.lock:
+            self.requests += 1
+            self.hedged += hedged
+            self.failovers += failed_over
+            self.wins[winner.name] += 1
+            self.latencies.append(latency)
+            if winner is self.primary:
+                self.primary_latencies.append(latency)
+
+    def __event_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, daemon=True).start()
+            return self.loop
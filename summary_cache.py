@@ -0,0 +1,82 @@
+# Local cache of LLM responses, so that the same work is never paid for twice
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+class SummaryCache:
+    """SQLite cache of LLM responses, keyed by a hash of (model, prompt template, input text).
+
+    Entries expire after ttl seconds, and only the max_entries most recently used ones are kept.
+    """
+
+    def __init__(self, path, ttl=90 * 24 * 3600, max_entries=10000, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    def get(self, model, prompt_template, text):
+        key = self.key(model, prompt_template, text)
+        now = self.clock()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, prompt_template, text, response):
+        key = self.key(model, prompt_template, text)
+        now = self.clock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now))
+            self.__evict(now)
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def key(model, prompt_template, text):
+        digest = hashlib.sha256()
+        for part in (model, prompt_template, text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def __evict(self, now):
+        self.connection.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+        entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if entries > self.max_entries:
+            self.connection.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY used_at LIMIT ?
+                )""", (entries - self.max_entries,))
@@ -0,0 +1,176 @@
+# A local HTTP stand-in for the OpenAI API, serving canned responses from a background thread
+
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+def response_body(text, input_tokens=10, output_tokens=5):
+    return {
+        "id": "resp_fake",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-3.5-turbo",
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_fake",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]
+        }],
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+    }
+
+class FakeOpenAIServer:
+    """Answers POST /v1/responses with the first words of the prompt's text, after delay seconds
+
+    delay can also be a function, returning the delay of each request, to draw it from a distribution.
+
+    Also stands in for the batch API: uploaded batch files are only processed when complete_batches is called.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.inputs = []
+        self.models = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.files = {}
+        self.batches = {}
+        self.routes = {
+            ("POST", "/v1/responses"): self.create_response,
+            ("POST", "/v1/files"): self.create_file,
+            ("GET", "/v1/files/"): self.file_content,
+            ("POST", "/v1/batches"): self.create_batch,
+            ("GET", "/v1/batches/"): self.retrieve_batch,
+        }
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.__handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def create_response(self, request):
+        prompt = request["input"]
+        with self.lock:
+            self.inputs.append(prompt)
+            self.models.append(request["model"])
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay() if callable(self.delay) else self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        text = prompt.split("\n", 1)[1]
+        return 200, response_body("summary of " + " ".join(text.split()[:3]), input_tokens=len(prompt.split()))
+
+    def create_file(self, request):
+        form = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {request['content_type']}\r\n\r\n".encode('utf-8') + request["body"])
+        fields = {part.get_param("name", header="content-disposition"): part for part in form.iter_parts()}
+        content = fields["file"].get_payload(decode=True)
+        return 200, self.__add_file(fields["file"].get_filename(), content, fields["purpose"].get_content().strip())
+
+    def file_content(self, request):
+        file_id = request["path"][len("/v1/files/"):-len("/content")]
+        if file_id not in self.files:
+            return 404, {"error": {"message": f"No file {file_id}"}}
+        return 200, self.files[file_id]["content"]
+
+    def create_batch(self, request):
+        with self.lock:
+            batch_id = f"batch_{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request["endpoint"],
+                "input_file_id": request["input_file_id"],
+                "completion_window": request["completion_window"],
+                "status": "in_progress",
+                "created_at": 0,
+                "output_file_id": None,
+                "error_file_id": None
+            }
+            return 200, self.batches[batch_id]
+
+    def retrieve_batch(self, request):
+        batch_id = request["path"][len("/v1/batches/"):]
+        if batch_id not in self.batches:
+            return 404, {"error": {"message": f"No batch {batch_id}"}}
+        return 200, self.batches[batch_id]
+
+    def complete_batches(self, failing_custom_ids=()):
+        """Process the pending batches, with an error for the requests of the given custom IDs"""
+        for batch in self.batches.values():
+            if batch["status"] != "in_progress":
+                continue
+            lines = []
+            for line in self.files[batch["input_file_id"]]["content"].decode('utf-8').splitlines():
+                request = json.loads(line)
+                if request["custom_id"] in failing_custom_ids:
+                    response = {"status_code": 500, "body": {"error": {"message": "Internal error"}}}
+                else:
+                    status, body = self.create_response(request["body"])
+                    response = {"status_code": status, "body": body}
+                lines.append(json.dumps({"id": f"req_{len(lines) + 1}", "custom_id": request["custom_id"], "response": response}))
+            batch["output_file_id"] = self.__add_file("output.jsonl", "\n".join(lines).encode('utf-8'), "batch_output")["id"]
+            batch["status"] = "completed"
+
+    def __add_file(self, filename, content, purpose):
+        with self.lock:
+            file_id = f"file_{len(self.files) + 1}"
+            self.files[file_id] = {"content": content, "purpose": purpose}
+            return {"id": file_id, "object": "file", "bytes": len(content), "created_at": 0,
+                    "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def __handler_class(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.__dispatch("GET")
+
+            def do_POST(self):
+                self.__dispatch("POST")
+
+            def __dispatch(self, method):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = self.path.split("?")[0]
+                route = fake_server.routes.get((method, path))
+                if route is None:
+                    route = next((handler for (route_method, prefix), handler in fake_server.routes.items()
+                                  if route_method == method and prefix.endswith("/") and path.startswith(prefix)), None)
+                if route is None:
+                    status, payload = 404, {"error": {"message": f"No route for {method} {path}"}}
+                else:
+                    content_type = self.headers.get("Content-Type", "")
+                    request = json.loads(body) if body and content_type.startswith("application/json") else {"path": path, "body": body, "content_type": content_type}
+                    status, payload = route(request)
+
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream" if isinstance(payload, bytes) else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up on the request, like a hedged request losing the race
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,44 @@
+import unittest
+import os
+from benchmarks.benchmark_youtube_summarizer import run_benchmark
+from benchmarks.benchmark_search_index import run_search_benchmark
+from benchmarks.benchmark_startup import run_startup_benchmark
+from benchmarks.benchmark_hedging import run_hedging_benchmark
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_measures_a_run_with_injected_errors(self):
+        working_directory = os.getcwd()
+
+        result = run_benchmark(10, transcript_latency=0, summary_latency=0, error_rate=0.3, workers=2)
+
+        self.assertEqual(working_directory, os.getcwd())
+        self.assertEqual(10, result["videos"])
+        self.assertGreater(result["videos_per_second"], 0)
+        self.assertLessEqual(result["latency_p50"], result["latency_p99"])
+        self.assertGreater(result["peak_memory_bytes"], 0)
+        self.assertGreater(result["transcript_retries"] + result["summary_retries"], 0)
+
+    def test_measures_the_query_latency_of_the_search_index(self):
+        result = run_search_benchmark(50, query_count=5)
+
+        self.assertEqual(50, result["summaries"])
+        self.assertLessEqual(result["query_p50"], result["query_p99"])
+        self.assertGreater(result["results_per_query"], 0)
+
+    def test_does_not_load_the_heavy_modules_when_nothing_is_new(self):
+        result = run_startup_benchmark(repeats=1)
+
+        self.assertEqual([], result["lazy"]["heavy_modules"])
+        self.assertIn("openai", result["eager"]["heavy_modules"])
+        self.assertLess(result["lazy"]["import_seconds"], result["eager"]["import_seconds"])
+
+    def test_hedging_cuts_the_p99_latency(self):
+        result = run_hedging_benchmark(request_count=40, slow_every=10, slow_latency=0.3, secondary_latency=0.02)
+
+        self.assertEqual(0, result["unhedged"]["hedged"])
+        self.assertGreater(result["hedged"]["hedge_rate"], 0)
+        self.assertGreater(result["p99_improvement"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import json
+import threading
+import time
+import urllib.request
+from daemon import ChannelScheduler, Daemon, parse_channel_intervals
+
+class FakeClock:
+    def __init__(self):
+        self.current_time = 0.0
+
+    def __call__(self):
+        return self.current_time
+
+class NoJitter:
+    def uniform(self, low, high):
+        return (low + high) / 2
+
+class FakeYoutubeSummarizer:
+    """Records the channels it runs, failing for some, and taking delay seconds per run"""
+    def __init__(self, failing_channels=(), delay=0):
+        self.failing_channels = failing_channels
+        self.delay = delay
+        self.runs = []
+        self.finished_runs = []
+        self.running = threading.Event()
+
+    def run(self, channel, email, commit_summaries=False):
+        self.runs.append(channel)
+        self.running.set()
+        time.sleep(self.delay)
+        self.finished_runs.append(channel)
+        if channel in self.failing_channels:
+            raise RuntimeError("YouTube is down")
+
+class TestChannelScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def build_scheduler(self, intervals, **kwargs):
+        return ChannelScheduler(intervals, clock=self.clock, random_generator=NoJitter(), **kwargs)
+
+    def test_polls_every_channel_straight_away(self):
+        scheduler = self.build_scheduler({"UC_a": 60, "UC_b": 120})
+
+        self.assertEqual(("UC_a", 0), scheduler.next_due())
+        scheduler.record_run("UC_a")
+        self.assertEqual(("UC_b", 0), scheduler.next_due())
+
+    def test_polls_each_channel_at_its_own_interval(self):
+        scheduler = self.build_scheduler({"UC_a": 60, "UC_b": 120})
+        scheduler.record_run("UC_a")
+        scheduler.record_run("UC_b")
+
+        self.assertEqual(("UC_a", 60), scheduler.next_due())
+        self.clock.current_time = 60
+        scheduler.record_run("UC_a")
+        self.assertEqual(("UC_b", 60), scheduler.next_due())
+
+    def test_spreads_polls_with_jitter(self):
+        scheduler = ChannelScheduler({"UC_a": 100}, jitter=0.1, clock=self.clock)
+        scheduler.record_run("UC_a")
+
+        self.assertTrue(90 <= scheduler.next_due()[1] <= 110)
+
+    def test_backs_off_channels_that_keep_failing(self):
+        scheduler = self.build_scheduler({"UC_a": 60}, max_backoff=300)
+        waits = []
+        for _ in range(4):
+            scheduler.record_run("UC_a", error=RuntimeError("YouTube is down"))
+            waits.append(scheduler.next_due()[1])
+        scheduler.record_run("UC_a")
+        waits.append(scheduler.next_due()[1])
+
+        self.assertEqual([120, 240, 300, 300, 60], waits)
+
+    def test_reports_the_state_of_every_channel(self):
+        scheduler = self.build_scheduler({"UC_a": 60})
+        scheduler.record_run("UC_a", error=RuntimeError("YouTube is down"))
+
+        status = scheduler.status()["UC_a"]
+
+        self.assertEqual({"runs": 1, "consecutive_failures": 1, "last_error": "YouTube is down", "next_run_in": 120},
+                         {key: status[key] for key in ("runs", "consecutive_failures", "last_error", "next_run_in")})
+
+    def test_parses_per_channel_intervals(self):
+        self.assertEqual({"UC_a": 600, "feed.xml": 3600}, parse_channel_intervals("UC_a@600,feed.xml", 3600))
+
+class TestDaemon(unittest.TestCase):
+
+    def start_daemon(self, youtube_summarizer, intervals):
+        daemon = Daemon(youtube_summarizer, ChannelScheduler(intervals), "user@example.com", health_port=0)
+        thread = threading.Thread(target=daemon.run)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(daemon.stop)
+        daemon.started.wait(5)
+        return daemon, thread
+
+    def get(self, daemon, path):
+        with urllib.request.urlopen(daemon.health_url + path, timeout=5) as response:
+            return json.loads(response.read())
+
+    def test_runs_every_channel_then_waits_for_the_next_poll(self):
+        youtube_summarizer = FakeYoutubeSummarizer(failing_channels={"UC_b"})
+        daemon, thread = self.start_daemon(youtube_summarizer, {"UC_a": 3600, "UC_b": 3600})
+
+        deadline = time.monotonic() + 5
+        while len(youtube_summarizer.finished_runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        status = self.get(daemon, "/status")
+
+        self.assertEqual(["UC_a", "UC_b"], youtube_summarizer.runs)
+        self.assertEqual({"status": "ok"}, self.get(daemon, "/health"))
+        self.assertEqual(0, status["channels"]["UC_a"]["consecutive_failures"])
+        self.assertEqual("YouTube is down", status["channels"]["UC_b"]["last_error"])
+
+    def test_stops_promptly_while_waiting(self):
+        youtube_summarizer = FakeYoutubeSummarizer()
+        daemon, thread = self.start_daemon(youtube_summarizer, {"UC_a": 3600})
+        youtube_summarizer.running.wait(5)
+
+        daemon.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+
+    def test_finishes_the_current_channel_before_stopping(self):
+        youtube_summarizer = FakeYoutubeSummarizer(delay=0.2)
+        daemon, thread = self.start_daemon(youtube_summarizer, {"UC_a": 3600, "UC_b": 3600})
+        youtube_summarizer.running.wait(5)
+
+        self.assertEqual({"status": "ok"}, self.get(daemon, "/health"))
+        daemon.stop()
+        self.assertEqual("stopping", self.get(daemon, "/status")["status"])
+        thread.join(5)
+
+        self.assertEqual(["UC_a"], youtube_summarizer.finished_runs)
+
+if __name__ == '__main__':
+    unittest.main()
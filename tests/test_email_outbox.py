@@ -0,0 +1,101 @@
+import unittest
+import socket
+import tempfile
+from aiosmtpd.controller import Controller
+from email_outbox import EmailOutbox, SmtpSender, SMTP_TRANSIENT_ERRORS
+from rate_limiter import RateLimiter
+
+class RecordingHandler:
+    """Keeps the emails received by the local SMTP server, with the client address of their connection"""
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.append({"peer": session.peer, "to": envelope.rcpt_tos, "content": envelope.content.decode('utf-8')})
+        return "250 OK"
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def quick_rate_limiter():
+    return RateLimiter(max_retries=2, base_delay=0.001, max_delay=0.01, retry_on=SMTP_TRANSIENT_ERRORS)
+
+class TestEmailOutbox(unittest.TestCase):
+    """Delivers to a local aiosmtpd server, standing in for Gmail"""
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.outbox_dir = temp_dir.name
+        self.port = free_port()
+        self.handler = RecordingHandler()
+
+    def start_server(self):
+        controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+    def sender(self):
+        return SmtpSender("127.0.0.1", self.port, use_ssl=False, timeout=5, rate_limiter=quick_rate_limiter())
+
+    def test_delivers_queued_emails_over_a_single_connection(self):
+        self.start_server()
+        sender = self.sender()
+        outbox = EmailOutbox(self.outbox_dir, sender)
+        outbox.send("user@example.com", "Channel 1", "<h1>One</h1>")
+        outbox.send("user@example.com", "Channel 2", "<h1>Two</h1>")
+        self.assertEqual([], self.handler.received)
+
+        self.assertEqual(2, outbox.deliver())
+
+        self.assertEqual(2, len(self.handler.received))
+        self.assertEqual(1, len({email["peer"] for email in self.handler.received}))
+        self.assertEqual(1, sender.connections)
+        self.assertIn("Subject: Channel 1", self.handler.received[0]["content"])
+        self.assertEqual([], outbox.pending())
+
+    def test_merges_the_emails_of_a_recipient_into_a_digest(self):
+        self.start_server()
+        outbox = EmailOutbox(self.outbox_dir, self.sender(), digest_subject="New videos from {count} channels")
+        outbox.send("user@example.com", "Channel 1", "<h1>One</h1>")
+        outbox.send("other@example.com", "Channel 1", "<h1>One</h1>")
+        outbox.send("user@example.com", "Channel 2", "<h1>Two</h1>")
+
+        self.assertEqual(3, outbox.deliver())
+
+        self.assertEqual([["user@example.com"], ["other@example.com"]], [email["to"] for email in self.handler.received])
+        digest = self.handler.received[0]["content"]
+        self.assertIn("Subject: New videos from 2 channels", digest)
+        self.assertLess(digest.index("<h1>One</h1>"), digest.index("<h1>Two</h1>"))
+        self.assertIn("Subject: Channel 1", self.handler.received[1]["content"])
+
+    def test_keeps_the_emails_queued_while_the_server_is_down(self):
+        outbox = EmailOutbox(self.outbox_dir, self.sender())
+        outbox.send("user@example.com", "Channel 1", "<h1>One</h1>")
+
+        self.assertEqual(0, outbox.deliver())
+        self.assertEqual(1, len(outbox.pending()))
+
+        self.start_server()
+        self.assertEqual(1, EmailOutbox(self.outbox_dir, self.sender()).deliver())
+        self.assertEqual(1, len(self.handler.received))
+        self.assertEqual([], outbox.pending())
+
+    def test_reconnects_when_the_connection_was_dropped(self):
+        self.start_server()
+        sender = self.sender()
+        sender.send("user@example.com", "First", "<p>1</p>")
+        # the server closing an idle connection
+        sender.connection.sock.shutdown(socket.SHUT_RDWR)
+
+        sender.send("user@example.com", "Second", "<p>2</p>")
+        sender.close()
+
+        self.assertEqual(2, len(self.handler.received))
+        self.assertEqual(2, sender.connections)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import io
+import tracemalloc
+from feed import ChannelFeed
+
+def entry(video_id):
+    return f'''
+        <entry>
+            <yt:videoId>{video_id}</yt:videoId>
+            <yt:channelId>UCsomething_else_entirely</yt:channelId>
+            <title>Video {video_id}</title>
+            <published>2025-09-12T00:00:00+00:00</published>
+        </entry>'''
+
+def feed_file(entry_count, tail="</feed>", header='<yt:channelId>_channel_id_</yt:channelId>'):
+    entries = "".join(entry(str(i)) for i in range(1, entry_count + 1))
+    xml = f'''<?xml version="1.0" encoding="UTF-8"?>
+        <feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+            <title>My Channel</title>
+            {header}
+            {entries}
+        {tail}'''
+    return io.BytesIO(xml.encode('utf-8'))
+
+def peak_memory_to_read(entry_count):
+    xml_file = feed_file(entry_count)
+    tracemalloc.start()
+    try:
+        with ChannelFeed(xml_file) as feed:
+            for video_info in feed:
+                pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+class TestChannelFeed(unittest.TestCase):
+
+    def test_reads_channel_details(self):
+        with ChannelFeed(feed_file(2)) as feed:
+            self.assertEqual("UC_channel_id_", feed.channel_id)
+            self.assertEqual("My Channel", feed.title)
+
+    def test_yields_video_infos_in_feed_order(self):
+        with ChannelFeed(feed_file(2)) as feed:
+            video_infos = list(feed)
+
+        self.assertEqual([{
+            "id": "1",
+            "title": "Video 1",
+            "published": "2025-09-12T00:00:00+00:00",
+            "url": "https://www.youtube.com/watch?v=1"
+        }, {
+            "id": "2",
+            "title": "Video 2",
+            "published": "2025-09-12T00:00:00+00:00",
+            "url": "https://www.youtube.com/watch?v=2"
+        }], video_infos)
+
+    def test_reads_feeds_without_entries(self):
+        with ChannelFeed(feed_file(0)) as feed:
+            self.assertEqual([], list(feed))
+
+    def test_stops_reading_after_the_last_requested_entry(self):
+        with ChannelFeed(feed_file(1000, tail="<broken")) as feed:
+            first_video_info = next(iter(feed))
+
+        self.assertEqual("1", first_video_info["id"])
+
+    def test_fails_on_feeds_without_channel_id(self):
+        with self.assertRaises(RuntimeError):
+            ChannelFeed(feed_file(1, header=""))
+
+    def test_fails_on_invalid_xml(self):
+        with self.assertRaises(RuntimeError):
+            with ChannelFeed(feed_file(1, tail="<broken")) as feed:
+                list(feed)
+
+    def test_memory_stays_flat_whatever_the_feed_size(self):
+        small_feed_peak = peak_memory_to_read(100)
+        large_feed_peak = peak_memory_to_read(10000)
+
+        self.assertLess(large_feed_peak, 2 * small_feed_peak)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import subprocess
+import tempfile
+from git_repository import GitRepository, GitError
+
+def git(path, *args):
+    return subprocess.run(["git", "-C", path, *args], check=True, capture_output=True, text=True).stdout.strip()
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+class TestGitRepository(unittest.TestCase):
+    """Works on clones of a local bare repository, standing in for the remote"""
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.remote = os.path.join(temp_dir.name, "remote.git")
+        git(temp_dir.name, "init", "--quiet", "--bare", "--initial-branch=main", self.remote)
+
+        self.clone = self.clone_remote(os.path.join(temp_dir.name, "clone"))
+        write_file(os.path.join(self.clone, "README.md"), "Summaries\n")
+        git(self.clone, "add", "README.md")
+        git(self.clone, "commit", "--quiet", "-m", "Initial commit")
+        git(self.clone, "push", "--quiet", "-u", "origin", "main")
+
+        self.other_clone = self.clone_remote(os.path.join(temp_dir.name, "other_clone"))
+
+    def clone_remote(self, path):
+        subprocess.run(["git", "clone", "--quiet", self.remote, path], check=True, capture_output=True)
+        git(path, "config", "user.name", "Test")
+        git(path, "config", "user.email", "test@example.com")
+        git(path, "config", "pull.rebase", "false")
+        return path
+
+    def remote_log(self):
+        return git(self.remote, "log", "--format=%s", "main").splitlines()
+
+    def test_commits_many_folders_at_once_and_pushes_them(self):
+        for channel in ["UC_a", "UC_b"]:
+            for video in range(3):
+                write_file(os.path.join(self.clone, channel, f"{video}.md"), f"summary {video}")
+
+        self.assertTrue(GitRepository(self.clone).commit_and_push(["UC_a", "UC_b"], "Add summaries for 6 videos from 2 channels"))
+
+        self.assertEqual(["Add summaries for 6 videos from 2 channels", "Initial commit"], self.remote_log())
+        self.assertEqual(6, len(git(self.remote, "ls-tree", "-r", "--name-only", "main").splitlines()) - 1)
+
+    def test_only_commits_the_given_folders(self):
+        write_file(os.path.join(self.clone, "UC_a", "1.md"), "summary")
+        write_file(os.path.join(self.clone, "notes.txt"), "work in progress")
+        git(self.clone, "add", "notes.txt")
+
+        GitRepository(self.clone).commit_and_push("UC_a", "Add summaries")
+
+        self.assertEqual(["UC_a/1.md", "README.md"], sorted(git(self.remote, "ls-tree", "-r", "--name-only", "main").splitlines(), reverse=True))
+
+    def test_does_not_commit_when_nothing_changed(self):
+        write_file(os.path.join(self.clone, "UC_a", "1.md"), "summary")
+        repository = GitRepository(self.clone)
+        repository.commit("UC_a", "Add summaries")
+
+        self.assertFalse(repository.commit("UC_a", "Add summaries again"))
+
+    def test_rebases_and_retries_a_rejected_push(self):
+        write_file(os.path.join(self.other_clone, "UC_b", "1.md"), "summary from elsewhere")
+        git(self.other_clone, "add", "UC_b")
+        git(self.other_clone, "commit", "--quiet", "-m", "Add summaries from elsewhere")
+        git(self.other_clone, "push", "--quiet")
+
+        write_file(os.path.join(self.clone, "UC_a", "1.md"), "summary")
+        self.assertTrue(GitRepository(self.clone).commit_and_push("UC_a", "Add summaries"))
+
+        self.assertEqual(["Add summaries", "Add summaries from elsewhere", "Initial commit"], self.remote_log())
+
+    def test_gives_up_when_the_rebase_conflicts(self):
+        write_file(os.path.join(self.other_clone, "UC_a", "1.md"), "another summary")
+        git(self.other_clone, "add", "UC_a")
+        git(self.other_clone, "commit", "--quiet", "-m", "Add conflicting summary")
+        git(self.other_clone, "push", "--quiet")
+
+        write_file(os.path.join(self.clone, "UC_a", "1.md"), "summary")
+        repository = GitRepository(self.clone)
+        repository.commit("UC_a", "Add summaries")
+
+        with self.assertRaises(GitError):
+            repository.push()
+        self.assertEqual("", git(self.clone, "status", "--porcelain"))
+        self.assertFalse(os.path.exists(os.path.join(self.clone, ".git", "rebase-merge")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import os
+from pyfakefs.fake_filesystem_unittest import Patcher
+from journal import RunJournal, FETCHED, SUMMARIZED, WRITTEN, EMAILED, reached
+
+JOURNAL_DIR = "journals"
+
+class TestRunJournal(unittest.TestCase):
+
+    def test_keeps_the_latest_stage_and_all_fields_of_each_video(self):
+        with Patcher():
+            journal = RunJournal(JOURNAL_DIR)
+            journal.record("channel", "abc", FETCHED, transcript_hash="hash")
+            journal.record("channel", "abc", SUMMARIZED, summary="summary")
+            journal.record("channel", "xyz", FETCHED, transcript_hash="other hash")
+
+            entries = RunJournal(JOURNAL_DIR).entries("channel")
+
+        self.assertEqual(["abc", "xyz"], list(entries))
+        self.assertEqual({"video_id": "abc", "stage": SUMMARIZED, "transcript_hash": "hash", "summary": "summary"}, entries["abc"])
+
+    def test_keeps_channels_apart(self):
+        with Patcher():
+            journal = RunJournal(JOURNAL_DIR)
+            journal.record("channel", "abc", FETCHED)
+            journal.record("feeds/archive.xml", "xyz", FETCHED)
+
+            self.assertEqual(["abc"], list(journal.entries("channel")))
+            self.assertEqual(["xyz"], list(journal.entries("feeds/archive.xml")))
+
+    def test_skips_a_record_cut_short_by_a_crash(self):
+        with Patcher():
+            journal = RunJournal(JOURNAL_DIR)
+            journal.record("channel", "abc", WRITTEN)
+            with open(os.path.join(JOURNAL_DIR, "channel.jsonl"), 'a') as f:
+                f.write('{"video_id": "abc", "sta')
+
+            self.assertEqual(WRITTEN, journal.entries("channel")["abc"]["stage"])
+
+    def test_forgets_everything_once_cleared(self):
+        with Patcher():
+            journal = RunJournal(JOURNAL_DIR)
+            journal.record("channel", "abc", EMAILED)
+            journal.clear("channel")
+
+            self.assertEqual({}, journal.entries("channel"))
+
+    def test_tells_whether_a_stage_was_reached(self):
+        self.assertTrue(reached({"stage": EMAILED}, WRITTEN))
+        self.assertTrue(reached({"stage": WRITTEN}, WRITTEN))
+        self.assertFalse(reached({"stage": SUMMARIZED}, WRITTEN))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import threading
+from lazy_service import LazyService
+
+class Service:
+    def __init__(self):
+        self.name = "service"
+
+    def greet(self, who):
+        return f"Hello {who}"
+
+class TestLazyService(unittest.TestCase):
+
+    def test_builds_the_service_on_first_use_only(self):
+        built = []
+        service = LazyService(lambda: built.append(1) or Service())
+        self.assertFalse(service.is_built)
+        self.assertEqual([], built)
+
+        self.assertEqual("Hello you", service.greet("you"))
+        self.assertEqual("service", service.name)
+
+        self.assertTrue(service.is_built)
+        self.assertEqual([1], built)
+
+    def test_builds_the_service_once_when_used_by_many_threads(self):
+        built = []
+        barrier = threading.Barrier(8)
+
+        def build():
+            built.append(1)
+            return Service()
+        service = LazyService(build)
+
+        def use():
+            barrier.wait()
+            service.greet("thread")
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([1], built)
+
+    def test_raises_attribute_errors_of_the_service(self):
+        with self.assertRaises(AttributeError):
+            LazyService(Service).missing
+
+if __name__ == '__main__':
+    unittest.main()
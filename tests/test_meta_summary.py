@@ -0,0 +1,62 @@
+import unittest
+import threading
+import time
+from meta_summary import TreeSummarizer
+
+class RecordingSummarizer:
+    """Summarizes a text as the list of its lines, recording the prompts and how many run at once"""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def summarize(self, text):
+        with self.lock:
+            self.prompts.append(text)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return "S(" + ",".join(text.split("\n\n")) + ")"
+
+class TestTreeSummarizer(unittest.TestCase):
+
+    def test_summarizes_summaries_fitting_one_prompt_at_once(self):
+        summarizer = RecordingSummarizer()
+
+        summary = TreeSummarizer(summarizer.summarize, max_tokens=100).summarize_all(["a", "b", "c"])
+
+        self.assertEqual("S(a,b,c)", summary)
+        self.assertEqual(1, len(summarizer.prompts))
+
+    def test_reduces_many_summaries_as_a_tree(self):
+        summarizer = RecordingSummarizer()
+        # 2 summaries of 8 characters, and their separator, fit a prompt of 8 tokens
+        summaries = (f"summary{i}" for i in range(8))
+
+        summary = TreeSummarizer(summarizer.summarize, max_tokens=8).summarize_all(summaries)
+
+        self.assertEqual("S(S(S(summary0,summary1),S(summary2,summary3)),S(S(summary4,summary5),S(summary6,summary7)))", summary)
+        self.assertEqual(7, len(summarizer.prompts))
+        self.assertTrue(all(len(prompt) <= 8 * 4 for prompt in summarizer.prompts[:4]))
+
+    def test_makes_progress_with_summaries_too_long_for_a_prompt(self):
+        summarizer = RecordingSummarizer()
+
+        summary = TreeSummarizer(summarizer.summarize, max_tokens=1).summarize_all(["long a", "long b", "long c"])
+
+        self.assertEqual("S(S(long a,long b),S(long c))", summary)
+
+    def test_bounds_the_requests_in_flight(self):
+        summarizer = RecordingSummarizer(delay=0.02)
+
+        TreeSummarizer(summarizer.summarize, max_tokens=4, max_in_flight=2).summarize_all(f"summary{i}" for i in range(20))
+
+        self.assertEqual(2, summarizer.max_in_flight)
+
+if __name__ == '__main__':
+    unittest.main()
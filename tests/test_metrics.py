@@ -0,0 +1,80 @@
+import unittest
+import json
+from pyfakefs.fake_filesystem_unittest import Patcher
+from metrics import RunMetrics
+
+class FakeClock:
+    def __init__(self):
+        self.current_time = 0.0
+
+    def __call__(self):
+        return self.current_time
+
+class TestRunMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = RunMetrics(clock=self.clock, wall_clock=lambda: 1700000000)
+
+    def test_times_every_stage(self):
+        for seconds in [2, 3]:
+            with self.metrics.stage("transcript_fetch", "abc"):
+                self.clock.current_time += seconds
+        with self.metrics.stage("git"):
+            self.clock.current_time += 1
+
+        report = self.metrics.report()
+
+        self.assertEqual({"transcript_fetch": {"count": 2, "seconds": 5}, "git": {"count": 1, "seconds": 1}}, report["stages"])
+        self.assertEqual({"seconds": 5, "stages": {"transcript_fetch": 5}}, report["videos"]["abc"])
+        self.assertEqual(6, report["seconds"])
+
+    def test_times_failed_stages_too(self):
+        with self.assertRaises(RuntimeError):
+            with self.metrics.stage("email_send"):
+                self.clock.current_time += 4
+                raise RuntimeError("SMTP server is down")
+
+        self.assertEqual({"count": 1, "seconds": 4}, self.metrics.report()["stages"]["email_send"])
+
+    def test_adds_counters_by_video_and_in_total(self):
+        self.metrics.add("abc", input_tokens=100, cost=0.5)
+        self.metrics.add("abc", input_tokens=50)
+        self.metrics.add("xyz", input_tokens=10)
+        self.metrics.add(feed_bytes=2048)
+
+        report = self.metrics.report()
+
+        self.assertEqual(150, report["videos"]["abc"]["input_tokens"])
+        self.assertEqual(0.5, report["videos"]["abc"]["cost"])
+        self.assertEqual({"input_tokens": 160, "cost": 0.5, "feed_bytes": 2048}, report["totals"])
+
+    def test_writes_a_json_report(self):
+        self.metrics.add("abc", input_tokens=100)
+
+        with Patcher():
+            self.metrics.write_report(".cache/run_report.json")
+            with open(".cache/run_report.json") as f:
+                report = json.load(f)
+
+        self.assertEqual(1700000000, report["started_at"])
+        self.assertEqual({"input_tokens": 100}, report["totals"])
+
+    def test_writes_a_prometheus_textfile(self):
+        with self.metrics.stage("summarize", "abc"):
+            self.clock.current_time += 2
+        self.metrics.add("abc", output_tokens=30)
+
+        with Patcher():
+            self.metrics.write_prometheus("metrics/youtube_summarizer.prom")
+            with open("metrics/youtube_summarizer.prom") as f:
+                lines = f.read().splitlines()
+
+        self.assertIn('youtube_summarizer_stage_seconds{stage="summarize"} 2.0', lines)
+        self.assertIn('youtube_summarizer_stage_runs{stage="summarize"} 1', lines)
+        self.assertIn("youtube_summarizer_output_tokens 30", lines)
+        self.assertIn("youtube_summarizer_videos 1", lines)
+        self.assertIn("# TYPE youtube_summarizer_output_tokens gauge", lines)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+import os
+import tempfile
+from rate_limiter import RateLimiter, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.current_time = 0.0
+        self.sleeps = []
+
+    def now(self):
+        return self.current_time
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.current_time += seconds
+
+class NoJitter:
+    """Always picks the upper bound, making backoff delays deterministic"""
+    def uniform(self, low, high):
+        return high
+
+class Throttled(Exception):
+    pass
+
+class Banned(Exception):
+    pass
+
+class FlakyService:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def call(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+def build_rate_limiter(clock, **kwargs):
+    return RateLimiter(clock=clock, random_generator=NoJitter(), retry_on=(Throttled,), ban_on=(Banned,), **kwargs)
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_lets_a_burst_through_without_waiting(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, rate=1, burst=3)
+
+        waits = [rate_limiter.acquire() for _ in range(3)]
+
+        self.assertEqual([0, 0, 0], waits)
+        self.assertEqual([], clock.sleeps)
+
+    def test_paces_requests_once_the_burst_is_spent(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, rate=0.5, burst=1)
+
+        waits = [rate_limiter.acquire() for _ in range(3)]
+
+        self.assertEqual([0, 2, 2], waits)
+        self.assertEqual(4, rate_limiter.stats()["waited"])
+
+    def test_does_not_wait_when_requests_are_already_spaced(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, rate=0.5, burst=1)
+
+        rate_limiter.acquire()
+        clock.current_time += 10
+
+        self.assertEqual(0, rate_limiter.acquire())
+
+    def test_does_not_pace_without_a_rate(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock)
+
+        waits = [rate_limiter.acquire() for _ in range(10)]
+
+        self.assertEqual([0] * 10, waits)
+
+    def test_retries_throttled_calls_with_exponential_backoff(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, base_delay=1, max_delay=60)
+        service = FlakyService(Throttled(), Throttled(), Throttled())
+
+        self.assertEqual("ok", rate_limiter.call(service.call))
+
+        self.assertEqual(4, service.calls)
+        self.assertEqual([1, 2, 4], clock.sleeps)
+        self.assertEqual(3, rate_limiter.stats()["retries"])
+        self.assertEqual(3, rate_limiter.last_call_retries())
+
+    def test_backoff_delays_are_jittered_and_capped(self):
+        clock = FakeClock()
+        rate_limiter = RateLimiter(clock=clock, retry_on=(Throttled,), base_delay=10, max_delay=15, max_retries=3)
+        service = FlakyService(Throttled(), Throttled(), Throttled())
+
+        rate_limiter.call(service.call)
+
+        self.assertTrue(5 <= clock.sleeps[0] <= 10)
+        self.assertTrue(7.5 <= clock.sleeps[1] <= 15)
+        self.assertTrue(7.5 <= clock.sleeps[2] <= 15)
+
+    def test_gives_up_after_max_retries(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, max_retries=2)
+        service = FlakyService(Throttled(), Throttled(), Throttled())
+
+        with self.assertRaises(Throttled):
+            rate_limiter.call(service.call)
+        self.assertEqual(3, service.calls)
+
+    def test_does_not_retry_other_errors(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock)
+        service = FlakyService(ValueError())
+
+        with self.assertRaises(ValueError):
+            rate_limiter.call(service.call)
+        self.assertEqual(1, service.calls)
+
+    def test_does_not_retry_bans(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, ban_threshold=3)
+        service = FlakyService(Banned())
+
+        with self.assertRaises(Banned):
+            rate_limiter.call(service.call)
+        self.assertEqual(1, service.calls)
+        self.assertEqual([], clock.sleeps)
+
+    def test_opens_the_circuit_after_repeated_bans(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, ban_threshold=2, ban_cooldown=3600)
+        service = FlakyService(Banned(), Banned(), Banned())
+
+        with self.assertRaises(Banned):
+            rate_limiter.call(service.call)
+        with self.assertRaises(CircuitOpenError):
+            rate_limiter.call(service.call)
+        self.assertEqual(2, service.calls)
+
+        with self.assertRaises(CircuitOpenError):
+            rate_limiter.call(service.call)
+        self.assertEqual(2, service.calls)
+
+    def test_lets_a_call_through_once_the_cooldown_is_over(self):
+        clock = FakeClock()
+        rate_limiter = build_rate_limiter(clock, ban_threshold=1, ban_cooldown=3600)
+        service = FlakyService(Banned())
+
+        with self.assertRaises(CircuitOpenError):
+            rate_limiter.call(service.call)
+        clock.current_time += 3600
+
+        self.assertEqual("ok", rate_limiter.call(service.call))
+        self.assertEqual(1, rate_limiter.stats()["bans"])
+
+    def test_keeps_the_circuit_open_across_runs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_path = os.path.join(temp_dir, "circuit.json")
+            clock = FakeClock()
+            with self.assertRaises(CircuitOpenError):
+                build_rate_limiter(clock, ban_threshold=1, ban_cooldown=3600, state_path=state_path).call(FlakyService(Banned()).call)
+
+            service = FlakyService()
+            next_run_rate_limiter = build_rate_limiter(clock, ban_threshold=1, ban_cooldown=3600, state_path=state_path)
+            with self.assertRaises(CircuitOpenError):
+                next_run_rate_limiter.call(service.call)
+            self.assertEqual(0, service.calls)
+
+            clock.current_time += 3600
+            self.assertEqual("ok", build_rate_limiter(clock, ban_threshold=1, state_path=state_path).call(service.call))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import os
+import tempfile
+from search_index import SearchIndex, parse_summary
+
+CHANNEL_ID = "UC_could_be_anything____"
+OTHER_CHANNEL_ID = "UC_another_channel______"
+
+def summary_markdown(title, body, published="2025-01-15T10:00:00+00:00", video_id="abc"):
+    return f"# {title}\n\n{body}\n\n*Published on {published} at https://www.youtube.com/watch?v={video_id}*\n"
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = temp_dir.name
+        self.index_path = os.path.join(self.root, ".cache", "search.sqlite")
+        self.search_index = SearchIndex(self.index_path)
+        self.addCleanup(self.search_index.close)
+
+    def write_summary(self, channel_id, video_id, markdown):
+        os.makedirs(os.path.join(self.root, channel_id), exist_ok=True)
+        with open(os.path.join(self.root, channel_id, video_id + ".md"), 'w') as f:
+            f.write(markdown)
+
+    def test_parses_the_summaries_written_by_the_summarizer(self):
+        self.assertEqual(("Caching 101", "Why caches matter.", "2025-01-15T10:00:00+00:00", "https://www.youtube.com/watch?v=abc"),
+                         parse_summary(summary_markdown("Caching 101", "Why caches matter.")))
+
+    def test_ranks_title_matches_first(self):
+        self.search_index.add(CHANNEL_ID, "1", summary_markdown("Cooking pasta", "A word about caches at the end."))
+        self.search_index.add(CHANNEL_ID, "2", summary_markdown("Caches explained", "How CPUs cache memory."))
+        self.search_index.add(CHANNEL_ID, "3", summary_markdown("Gardening", "Tomatoes and basil."))
+
+        results = self.search_index.search("cache")
+
+        self.assertEqual(["2", "1"], [result["video_id"] for result in results])
+        self.assertEqual("https://www.youtube.com/watch?v=abc", results[0]["url"])
+        self.assertIn("**", results[0]["snippet"])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+
+    def test_searches_the_published_date(self):
+        self.search_index.add(CHANNEL_ID, "1", summary_markdown("Old", "Text.", published="2023-03-01"))
+        self.search_index.add(CHANNEL_ID, "2", summary_markdown("New", "Text.", published="2025-06-01"))
+
+        self.assertEqual(["2"], [result["video_id"] for result in self.search_index.search("2025")])
+
+    def test_replaces_the_summary_of_a_video(self):
+        self.search_index.add(CHANNEL_ID, "1", summary_markdown("Draft", "Kubernetes."))
+        self.search_index.add(CHANNEL_ID, "1", summary_markdown("Final", "Docker."))
+
+        self.assertEqual([], self.search_index.search("kubernetes"))
+        self.assertEqual(["Final"], [result["title"] for result in self.search_index.search("docker")])
+        self.assertEqual(1, self.search_index.count())
+
+    def test_ignores_the_query_syntax_of_user_input(self):
+        self.search_index.add(CHANNEL_ID, "1", summary_markdown("C++ AND Rust", "Memory safety (NEAR the metal)."))
+
+        self.assertEqual(["1"], [result["video_id"] for result in self.search_index.search('rust "AND" (near')])
+        self.assertEqual([], self.search_index.search("*)"))
+
+    def test_rebuilds_a_missing_index_from_the_channel_folders(self):
+        self.write_summary(CHANNEL_ID, "1", summary_markdown("Caches explained", "Body."))
+        self.write_summary(OTHER_CHANNEL_ID, "2", summary_markdown("Cache invalidation", "Body."))
+        self.assertTrue(self.search_index.needs_rebuild)
+
+        self.assertEqual(2, self.search_index.rebuild(self.root))
+
+        self.assertEqual({"1", "2"}, {result["video_id"] for result in self.search_index.search("cache")})
+        self.assertFalse(SearchIndex(self.index_path).needs_rebuild)
+
+    def test_updates_only_the_changed_folders(self):
+        self.write_summary(CHANNEL_ID, "1", summary_markdown("Caches explained", "Body."))
+        self.write_summary(OTHER_CHANNEL_ID, "2", summary_markdown("Cache invalidation", "Body."))
+        self.search_index.rebuild(self.root)
+
+        self.write_summary(CHANNEL_ID, "3", summary_markdown("Cache lines", "Body."))
+        os.remove(os.path.join(self.root, OTHER_CHANNEL_ID, "2.md"))
+
+        self.assertEqual(1, self.search_index.update(self.root))
+        self.assertEqual({"1", "3"}, {result["video_id"] for result in self.search_index.search("cache")})
+        self.assertEqual(0, self.search_index.update(self.root))
+
+if __name__ == '__main__':
+    unittest.main()
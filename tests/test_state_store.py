@@ -0,0 +1,72 @@
+import unittest
+import os
+from pyfakefs.fake_filesystem_unittest import Patcher
+from state_store import StateStore, IN_PROGRESS, SUMMARIZED, FAILED
+
+CHANNEL_ID = "UC_could_be_anything____"
+
+def write_summary(channel_id, video_id):
+    os.makedirs(channel_id, exist_ok=True)
+    with open(os.path.join(channel_id, video_id + ".md"), 'w') as f:
+        f.write("a summary")
+
+class TestStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.state_store = StateStore(":memory:", clock=lambda: 1000.0)
+
+    def tearDown(self):
+        self.state_store.close()
+
+    def test_records_the_status_of_videos(self):
+        self.state_store.mark(CHANNEL_ID, "1", IN_PROGRESS)
+        self.state_store.mark(CHANNEL_ID, "1", SUMMARIZED, transcript_hash="t", summary_hash="s", cost=0.01)
+
+        video = self.state_store.video(CHANNEL_ID, "1")
+        self.assertEqual(SUMMARIZED, video["status"])
+        self.assertEqual(("t", "s", 0.01), (video["transcript_hash"], video["summary_hash"], video["cost"]))
+        self.assertEqual(1000.0, video["updated_at"])
+
+    def test_keeps_known_hashes_when_status_changes(self):
+        self.state_store.mark(CHANNEL_ID, "1", SUMMARIZED, transcript_hash="t")
+        self.state_store.mark(CHANNEL_ID, "1", FAILED, error="boom")
+
+        video = self.state_store.video(CHANNEL_ID, "1")
+        self.assertEqual(("t", "boom"), (video["transcript_hash"], video["error"]))
+
+    def test_lists_summarized_videos_of_a_channel(self):
+        self.state_store.mark(CHANNEL_ID, "1", SUMMARIZED)
+        self.state_store.mark(CHANNEL_ID, "2", FAILED)
+        self.state_store.mark("UC_another_channel______", "3", SUMMARIZED)
+
+        self.assertEqual({"1"}, self.state_store.summarized_video_ids(CHANNEL_ID))
+
+    def test_imports_existing_channel_folders(self):
+        with Patcher():
+            write_summary(CHANNEL_ID, "1")
+            write_summary("UC_another_channel______", "2")
+            os.makedirs("not_a_channel")
+
+            self.assertEqual(2, self.state_store.import_folders())
+
+        self.assertEqual({"1"}, self.state_store.summarized_video_ids(CHANNEL_ID))
+        self.assertEqual({"2"}, self.state_store.summarized_video_ids("UC_another_channel______"))
+
+    def test_marks_videos_whose_summary_file_was_added_as_summarized(self):
+        self.state_store.mark(CHANNEL_ID, "1", FAILED, error="boom")
+        with Patcher():
+            write_summary(CHANNEL_ID, "1")
+            self.state_store.import_channel_folder(CHANNEL_ID)
+
+        self.assertEqual({"1"}, self.state_store.summarized_video_ids(CHANNEL_ID))
+        self.assertIsNone(self.state_store.video(CHANNEL_ID, "1")["error"])
+
+    def test_marks_videos_whose_summary_file_was_removed_as_failed(self):
+        self.state_store.mark(CHANNEL_ID, "1", SUMMARIZED)
+        with Patcher():
+            self.state_store.import_channel_folder(CHANNEL_ID)
+
+        self.assertEqual(FAILED, self.state_store.video(CHANNEL_ID, "1")["status"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+import unittest
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from youtube_summarizer import Summarizer
+from summary_cache import SummaryCache
+from rate_limiter import RateLimiter
+from fake_openai_server import FakeOpenAIServer
+
+class FakeResponses:
+    """Summarizes a prompt as the first words of its text"""
+    def __init__(self):
+        self.inputs = []
+
+    def create(self, model, input):
+        self.inputs.append(input)
+        text = input.split("\n", 1)[1]
+        return SimpleNamespace(output_text="summary of " + " ".join(text.split()[:3]))
+
+class EchoResponses(FakeResponses):
+    """Summarizes a prompt as its whole text, slowly, recording how many requests are in flight"""
+    def __init__(self, delay=0):
+        super().__init__()
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def create(self, model, input):
+        with self.lock:
+            self.inputs.append(input)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return SimpleNamespace(output_text=input.split("\n", 1)[1])
+
+class FakeOpenAIClient:
+    def __init__(self, responses=None):
+        self.responses = responses or FakeResponses()
+
+class TestSummarizer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.client = FakeOpenAIClient()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def build_summarizer(self, **kwargs):
+        return Summarizer("api-key", rate_limiter=RateLimiter(), client=self.client, **kwargs)
+
+    def build_cache(self):
+        cache = SummaryCache(os.path.join(self.temp_dir.name, "summaries.sqlite"))
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_summarizes_a_transcript(self):
+        summary = self.build_summarizer().summarize_text("some transcript")
+
+        self.assertEqual("summary of some transcript", summary)
+        self.assertEqual(["Summarize the following transcript:\nsome transcript"], self.client.responses.inputs)
+
+    def test_never_sends_the_same_work_twice(self):
+        cache = self.build_cache()
+
+        first = self.build_summarizer(cache=cache).summarize_text("some transcript")
+        second = self.build_summarizer(cache=cache).summarize_text("some transcript")
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, len(self.client.responses.inputs))
+
+    def test_sends_different_work(self):
+        summarizer = self.build_summarizer(cache=self.build_cache())
+
+        summarizer.summarize_text("some transcript")
+        summarizer.summarize_text("another transcript")
+
+        self.assertEqual(2, len(self.client.responses.inputs))
+
+    def test_summarizes_a_20_minutes_transcript_in_a_single_call(self):
+        transcript = " ".join(f"word{i % 100}" for i in range(3000)) + "."
+
+        self.build_summarizer().summarize_text(transcript)
+
+        self.assertEqual(1, len(self.client.responses.inputs))
+
+    def test_does_not_combine_a_single_summary_again(self):
+        self.client = FakeOpenAIClient(EchoResponses())
+        transcript = " ".join(f"Part {i} is about topic {i}." for i in range(20))
+
+        self.build_summarizer(chunk_tokens=100, chunk_overlap_tokens=10).summarize_text(transcript)
+
+        chunk_prompts = [prompt for prompt in self.client.responses.inputs if prompt.startswith(Summarizer.CHUNK_PROMPT_TEMPLATE[:20])]
+        self.assertEqual(2, len(chunk_prompts))
+        self.assertEqual(3, len(self.client.responses.inputs))
+
+    def test_bounds_the_requests_in_flight(self):
+        self.client = FakeOpenAIClient(EchoResponses(delay=0.02))
+        transcript = " ".join(f"Part {i} is about topic {i}." for i in range(200))
+        summarizer = self.build_summarizer(chunk_tokens=100, chunk_overlap_tokens=10, max_fanout=8, max_in_flight=2)
+
+        threads = [threading.Thread(target=summarizer.summarize_text, args=(transcript,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, self.client.responses.max_in_flight)
+
+    def test_summarizes_long_transcripts_by_parts_then_combines_them(self):
+        transcript = " ".join(f"Part {i} is about topic {i}." for i in range(100))
+        summarizer = self.build_summarizer(chunk_tokens=200, chunk_overlap_tokens=20)
+
+        summary = summarizer.summarize_text(transcript)
+
+        chunk_prompts = [prompt for prompt in self.client.responses.inputs if prompt.startswith(Summarizer.CHUNK_PROMPT_TEMPLATE[:20])]
+        combine_prompts = [prompt for prompt in self.client.responses.inputs if prompt.startswith(Summarizer.COMBINE_PROMPT_TEMPLATE[:20])]
+        self.assertGreater(len(chunk_prompts), 1)
+        self.assertEqual(1, len(combine_prompts))
+        self.assertEqual("summary of summary of Part", summary)
+        self.assertIn("summary of Part 0 is\n\nsummary of Part", combine_prompts[0])
+
+    def test_combines_chunk_summaries_in_transcript_order(self):
+        transcript = " ".join(f"Part {i} is about topic {i}." for i in range(100))
+        summarizer = self.build_summarizer(chunk_tokens=200, chunk_overlap_tokens=20, max_fanout=8)
+
+        summarizer.summarize_text(transcript)
+
+        combine_prompt = self.client.responses.inputs[-1]
+        part_numbers = [int(part.split()[3]) for part in combine_prompt.split("\n", 1)[1].split("\n\n")]
+        self.assertEqual(sorted(part_numbers), part_numbers)
+
+    def test_combines_many_chunk_summaries_by_groups(self):
+        transcript = " ".join(f"Part {i} is about topic {i}." for i in range(2000))
+        summarizer = self.build_summarizer(chunk_tokens=100, chunk_overlap_tokens=10)
+
+        summary = summarizer.summarize_text(transcript)
+
+        combine_prompts = [prompt for prompt in self.client.responses.inputs if prompt.startswith(Summarizer.COMBINE_PROMPT_TEMPLATE[:20])]
+        self.assertGreater(len(combine_prompts), 1)
+        self.assertTrue(summary.startswith("summary of summary of"))
+
+    def test_records_latency_and_token_usage(self):
+        summarizer = self.build_summarizer()
+
+        summarizer.summarize_text("some transcript")
+        summarizer.summarize_text("another transcript")
+
+        stats = summarizer.usage_stats()
+        self.assertEqual(2, stats["requests"])
+        self.assertEqual(0, stats["cost"])
+        self.assertGreaterEqual(stats["latency_max"], stats["latency_p50"])
+
+class TestSummarizerAgainstALocalServer(unittest.TestCase):
+
+    def build_summarizer(self, server, **kwargs):
+        return Summarizer("api-key", rate_limiter=RateLimiter(), base_url=server.base_url, **kwargs)
+
+    def test_summarizes_through_the_api(self):
+        with FakeOpenAIServer() as server:
+            summarizer = self.build_summarizer(server)
+
+            self.assertEqual("summary of some long transcript", summarizer.summarize_text("some long transcript here"))
+            self.assertEqual("summary of another transcript", summarizer.summarize_text("another transcript"))
+
+        stats = summarizer.usage_stats()
+        self.assertEqual({"requests": 2, "input_tokens": 14, "output_tokens": 10, "retries": 0, "hedged": 0, "cache_hits": 0},
+                         {key: value for key, value in stats.items() if not key.startswith("latency") and key != "cost"})
+        self.assertAlmostEqual((14 * 0.50 + 10 * 1.50) / 1_000_000, stats["cost"])
+
+    def test_tells_apart_the_usage_of_each_label(self):
+        with FakeOpenAIServer() as server:
+            summarizer = self.build_summarizer(server, chunk_tokens=10, chunk_overlap_tokens=2)
+
+            with summarizer.usage_scope("long"):
+                summarizer.summarize_text("One sentence here. " * 6)
+            with summarizer.usage_scope("short"):
+                summarizer.summarize_text("a short one")
+
+        self.assertEqual(len(server.inputs) - 1, summarizer.usage_stats("long")["requests"])
+        self.assertEqual(1, summarizer.usage_stats("short")["requests"])
+
+    def test_summarizes_many_texts_concurrently_in_input_order(self):
+        texts = [f"transcript number {i}" for i in range(10)]
+
+        with FakeOpenAIServer(delay=0.05) as server:
+            summaries = self.build_summarizer(server).summarize_many(texts, max_in_flight=3)
+
+        self.assertEqual([f"summary of transcript number {i}" for i in range(10)], summaries)
+        self.assertEqual(3, server.max_in_flight)
+
+    def test_does_not_send_cached_texts_again(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = SummaryCache(os.path.join(temp_dir, "summaries.sqlite"))
+            self.addCleanup(cache.close)
+
+            with FakeOpenAIServer() as server:
+                summarizer = self.build_summarizer(server, cache=cache)
+                summarizer.summarize_text("transcript number 1")
+                summaries = summarizer.summarize_many(["transcript number 1", "transcript number 2"])
+
+        self.assertEqual(["summary of transcript number 1", "summary of transcript number 2"], summaries)
+        self.assertEqual(2, len(server.inputs))
+        self.assertEqual(1, summarizer.usage_stats()["cache_hits"])
+
+    def test_summarizes_texts_in_a_batch_job(self):
+        with FakeOpenAIServer() as server:
+            summarizer = self.build_summarizer(server)
+            batch_id = summarizer.submit_batch([("video-1", "transcript number 1"), ("video-2", "transcript number 2")])
+
+            self.assertIsNone(summarizer.batch_results(batch_id))
+            self.assertEqual([], server.inputs)
+
+            server.complete_batches()
+            results = summarizer.batch_results(batch_id)
+
+        self.assertEqual({"video-1": "summary of transcript number 1", "video-2": "summary of transcript number 2"}, results)
+
+    def test_leaves_failed_batch_requests_out_of_the_results(self):
+        with FakeOpenAIServer() as server:
+            summarizer = self.build_summarizer(server)
+            batch_id = summarizer.submit_batch([("video-1", "transcript number 1"), ("video-2", "transcript number 2")])
+            server.complete_batches(failing_custom_ids={"video-1"})
+
+            self.assertEqual({"video-2": "summary of transcript number 2"}, summarizer.batch_results(batch_id))
+
+    def test_does_not_submit_texts_too_long_for_a_batch_job(self):
+        with FakeOpenAIServer() as server:
+            with self.assertRaises(ValueError):
+                self.build_summarizer(server, chunk_tokens=10, chunk_overlap_tokens=2).submit_batch([("video-1", "word " * 100)])
+        self.assertEqual({}, server.batches)
+
+if __name__ == '__main__':
+    unittest.main()
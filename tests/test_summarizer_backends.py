@@ -0,0 +1,108 @@
+import unittest
+import itertools
+import socket
+from youtube_summarizer import Summarizer
+from rate_limiter import RateLimiter
+from summarizer_backends import OpenAIBackend, HedgedBackend
+from fake_openai_server import FakeOpenAIServer
+
+PROMPT = "Summarize the following transcript:\nthe transcript of a video"
+
+def every_nth_slow(n, fast, slow):
+    """Latencies of a backend with a slow request every n requests"""
+    counter = itertools.count(1)
+    return lambda: slow if next(counter) % n == 0 else fast
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/v1"
+
+class TestHedgedBackend(unittest.TestCase):
+    """Races two local fake OpenAI servers with different latency distributions"""
+
+    def hedged_backend(self, primary_url, secondary_url, **kwargs):
+        backend = HedgedBackend(OpenAIBackend("primary", "key", base_url=primary_url),
+                                OpenAIBackend("secondary", "key", base_url=secondary_url, model="local-model"), **kwargs)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_does_not_hedge_a_primary_answering_in_time(self):
+        with FakeOpenAIServer(delay=0.01) as primary, FakeOpenAIServer() as secondary:
+            backend = self.hedged_backend(primary.base_url, secondary.base_url, initial_hedge_delay=1)
+
+            response = backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        self.assertEqual("summary of the transcript of", response.output_text)
+        self.assertFalse(backend.last_call_hedged())
+        self.assertEqual([], secondary.inputs)
+        self.assertEqual({"primary": 1, "secondary": 0}, backend.stats()["wins"])
+
+    def test_hedges_a_slow_primary_and_cancels_it(self):
+        with FakeOpenAIServer(delay=1) as primary, FakeOpenAIServer(delay=0.01) as secondary:
+            backend = self.hedged_backend(primary.base_url, secondary.base_url, initial_hedge_delay=0.05)
+
+            backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        stats = backend.stats()
+        self.assertTrue(backend.last_call_hedged())
+        self.assertEqual({"primary": 0, "secondary": 1}, stats["wins"])
+        self.assertEqual((1, 1), (stats["hedged"], stats["cancelled"]))
+        self.assertLess(stats["latency_p99"], 0.5)
+
+    def test_fails_over_to_the_secondary_straight_away(self):
+        with FakeOpenAIServer(delay=0.01) as secondary:
+            backend = self.hedged_backend(closed_port_url(), secondary.base_url, initial_hedge_delay=10)
+
+            response = backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        self.assertEqual("summary of the transcript of", response.output_text)
+        self.assertEqual((1, 0), (backend.stats()["failovers"], backend.stats()["hedged"]))
+
+    def test_gives_up_after_the_deadline(self):
+        with FakeOpenAIServer(delay=1) as primary, FakeOpenAIServer(delay=1) as secondary:
+            backend = self.hedged_backend(primary.base_url, secondary.base_url, initial_hedge_delay=0.01, deadline=0.1)
+
+            with self.assertRaises(TimeoutError):
+                backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        self.assertEqual(2, backend.stats()["cancelled"])
+
+    def test_cuts_the_tail_latency_of_a_primary_slow_now_and_then(self):
+        with FakeOpenAIServer(delay=every_nth_slow(8, 0.01, 0.4)) as primary, FakeOpenAIServer(delay=0.03) as secondary:
+            backend = self.hedged_backend(primary.base_url, secondary.base_url, hedge_percentile=0.8, min_samples=5,
+                                          initial_hedge_delay=0.1, window=32)
+
+            for _ in range(64):
+                backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        stats = backend.stats()
+        self.assertGreater(stats["hedge_rate"], 0)
+        self.assertLess(stats["hedge_rate"], 0.5)
+        self.assertLess(stats["hedge_delay"], 0.1)
+        self.assertLess(stats["latency_p99"], 0.3)
+        self.assertEqual(stats["requests"], stats["wins"]["primary"] + stats["wins"]["secondary"])
+
+    def test_only_enforces_the_deadline_without_a_secondary(self):
+        with FakeOpenAIServer(delay=0.05) as primary:
+            backend = HedgedBackend(OpenAIBackend("primary", "key", base_url=primary.base_url), initial_hedge_delay=0.01)
+            self.addCleanup(backend.close)
+
+            backend.create(model=Summarizer.MODEL, input=PROMPT)
+
+        self.assertFalse(backend.last_call_hedged())
+        self.assertEqual({"primary": 1}, backend.stats()["wins"])
+        self.assertIsNone(backend.stats()["hedge_delay"])
+
+    def test_summarizer_records_the_hedged_requests(self):
+        with FakeOpenAIServer(delay=1) as primary, FakeOpenAIServer(delay=0.01) as secondary:
+            backend = self.hedged_backend(primary.base_url, secondary.base_url, initial_hedge_delay=0.05)
+            summarizer = Summarizer("api-key", rate_limiter=RateLimiter(), base_url=primary.base_url, backend=backend)
+
+            self.assertEqual("summary of a short transcript", summarizer.summarize_text("a short transcript"))
+
+        self.assertEqual(["local-model"], secondary.models)
+        self.assertEqual(1, summarizer.usage_stats()["hedged"])
+
+if __name__ == '__main__':
+    unittest.main()
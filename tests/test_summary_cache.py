@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+from summary_cache import SummaryCache
+
+MODEL = "gpt-test"
+TEMPLATE = "Summarize:\n{text}"
+
+class FakeClock:
+    def __init__(self):
+        self.current_time = 1000.0
+
+    def __call__(self):
+        return self.current_time
+
+class TestSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cache", "summaries.sqlite")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def build_cache(self, **kwargs):
+        cache = SummaryCache(self.path, clock=self.clock, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_returns_cached_responses(self):
+        cache = self.build_cache()
+        cache.put(MODEL, TEMPLATE, "some text", "a summary")
+
+        self.assertEqual("a summary", cache.get(MODEL, TEMPLATE, "some text"))
+
+    def test_persists_responses_across_runs(self):
+        self.build_cache().put(MODEL, TEMPLATE, "some text", "a summary")
+
+        self.assertEqual("a summary", self.build_cache().get(MODEL, TEMPLATE, "some text"))
+
+    def test_keys_responses_by_model_template_and_text(self):
+        cache = self.build_cache()
+        cache.put(MODEL, TEMPLATE, "some text", "a summary")
+
+        self.assertIsNone(cache.get("other-model", TEMPLATE, "some text"))
+        self.assertIsNone(cache.get(MODEL, "Other:\n{text}", "some text"))
+        self.assertIsNone(cache.get(MODEL, TEMPLATE, "other text"))
+
+    def test_expires_responses_after_ttl(self):
+        cache = self.build_cache(ttl=60)
+        cache.put(MODEL, TEMPLATE, "some text", "a summary")
+
+        self.clock.current_time += 61
+
+        self.assertIsNone(cache.get(MODEL, TEMPLATE, "some text"))
+
+    def test_evicts_least_recently_used_responses(self):
+        cache = self.build_cache(max_entries=2)
+        cache.put(MODEL, TEMPLATE, "text 1", "summary 1")
+        self.clock.current_time += 1
+        cache.put(MODEL, TEMPLATE, "text 2", "summary 2")
+        self.clock.current_time += 1
+        cache.get(MODEL, TEMPLATE, "text 1")
+        self.clock.current_time += 1
+        cache.put(MODEL, TEMPLATE, "text 3", "summary 3")
+
+        self.assertEqual("summary 1", cache.get(MODEL, TEMPLATE, "text 1"))
+        self.assertIsNone(cache.get(MODEL, TEMPLATE, "text 2"))
+        self.assertEqual("summary 3", cache.get(MODEL, TEMPLATE, "text 3"))
+
+    def test_reports_stats(self):
+        cache = self.build_cache()
+        cache.get(MODEL, TEMPLATE, "some text")
+        cache.put(MODEL, TEMPLATE, "some text", "a summary")
+        cache.get(MODEL, TEMPLATE, "some text")
+
+        self.assertEqual({"hits": 1, "misses": 1, "entries": 1}, cache.stats())
+
+if __name__ == '__main__':
+    unittest.main()
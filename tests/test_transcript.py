@@ -0,0 +1,72 @@
+import unittest
+from transcript import Transcript, timestamp_url
+
+SEGMENTS = [("Hello and welcome.", 0.0, 2.5), ("Today we talk about caches.", 2.5, 3.0),
+            ("First, why cache at all?", 5.5, 2.0), ("Because networks are slow.", 7.5, 2.5)]
+
+class TestTranscript(unittest.TestCase):
+
+    def setUp(self):
+        self.transcript = Transcript.from_segments(SEGMENTS)
+
+    def test_joins_segments_with_spaces(self):
+        self.assertEqual(" ".join(text for text, _, _ in SEGMENTS), str(self.transcript))
+        self.assertEqual(len(str(self.transcript)), len(self.transcript))
+
+    def test_keeps_the_timing_of_every_segment(self):
+        self.assertEqual(SEGMENTS, list(self.transcript.segments()))
+        self.assertEqual(0.0, self.transcript.start_time)
+        self.assertEqual(10.0, self.transcript.end_time)
+
+    def test_slices_by_time_range_over_the_same_buffer(self):
+        part = self.transcript.slice_time(2.5, 7.5)
+
+        self.assertEqual("Today we talk about caches. First, why cache at all?", str(part))
+        self.assertIs(self.transcript.buffer, part.buffer)
+        self.assertEqual(2.5, part.start_time)
+        self.assertEqual("", str(self.transcript.slice_time(20, 30)))
+
+    def test_splits_by_token_budget(self):
+        parts = self.transcript.split_tokens(14)
+
+        self.assertEqual(["Hello and welcome. Today we talk about caches.", "First, why cache at all? Because networks are slow."],
+                         [str(part) for part in parts])
+        self.assertEqual(5.5, parts[1].start_time)
+
+    def test_keeps_segments_longer_than_the_budget_whole(self):
+        parts = self.transcript.split_tokens(1)
+
+        self.assertEqual([text for text, _, _ in SEGMENTS], [str(part) for part in parts])
+
+    def test_tells_the_time_of_a_character(self):
+        part = self.transcript.slice_time(2.5, 10)
+
+        self.assertEqual(2.5, part.time_at(0))
+        self.assertEqual(5.5, part.time_at(str(part).index("why")))
+
+    def test_round_trips_through_its_compact_binary_form(self):
+        data = self.transcript.to_bytes()
+
+        self.assertEqual(SEGMENTS, list(Transcript.from_bytes(data).segments()))
+        self.assertEqual(8 + 4 * 3 * len(SEGMENTS) + len(str(self.transcript)), len(data))
+
+    def test_serialises_only_the_slice(self):
+        part = self.transcript.slice_time(5, 10)
+
+        self.assertEqual(SEGMENTS[2:], list(Transcript.from_bytes(part.to_bytes()).segments()))
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            Transcript.from_bytes(b"not a transcript")
+
+    def test_wraps_plain_text(self):
+        transcript = Transcript.from_text("some transcript")
+
+        self.assertEqual("some transcript", str(transcript))
+        self.assertEqual([("some transcript", 0.0, 0.0)], list(transcript.segments()))
+
+    def test_links_to_a_time_in_the_video(self):
+        self.assertEqual("https://www.youtube.com/watch?v=abc&t=75s", timestamp_url("https://www.youtube.com/watch?v=abc", 75.4))
+
+if __name__ == '__main__':
+    unittest.main()
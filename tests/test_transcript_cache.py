@@ -0,0 +1,82 @@
+import unittest
+import os
+import gzip
+from pyfakefs.fake_filesystem_unittest import Patcher
+from transcript_cache import TranscriptCache
+from transcript import Transcript
+
+CACHE_DIR = "cache"
+
+class TestTranscriptCache(unittest.TestCase):
+
+    def test_returns_cached_transcripts(self):
+        with Patcher():
+            cache = TranscriptCache(CACHE_DIR)
+            cache.put("abc", "some transcript")
+
+            self.assertEqual("some transcript", str(cache.get("abc")))
+
+    def test_keeps_the_timings_of_transcripts(self):
+        with Patcher():
+            cache = TranscriptCache(CACHE_DIR)
+            cache.put("abc", Transcript.from_segments([("some", 0.0, 1.5), ("transcript", 1.5, 2.0)]))
+
+            self.assertEqual([("some", 0.0, 1.5), ("transcript", 1.5, 2.0)], list(cache.get("abc").segments()))
+
+    def test_misses_unknown_videos_and_languages(self):
+        with Patcher():
+            cache = TranscriptCache(CACHE_DIR)
+            cache.put("abc", "some transcript", "en")
+
+            self.assertIsNone(cache.get("xyz"))
+            self.assertIsNone(cache.get("abc", "fr"))
+            self.assertEqual({"hits": 0, "misses": 2}, cache.stats())
+
+    def test_counts_hits_and_misses(self):
+        with Patcher():
+            cache = TranscriptCache(CACHE_DIR)
+            cache.get("abc")
+            cache.put("abc", "some transcript")
+            cache.get("abc")
+            cache.get("abc")
+
+            self.assertEqual({"hits": 2, "misses": 1}, cache.stats())
+
+    def test_stores_transcripts_compressed(self):
+        with Patcher():
+            transcript = "again and again " * 1000
+            TranscriptCache(CACHE_DIR).put("abc", transcript)
+
+            path = os.path.join(CACHE_DIR, "abc.en.transcript.gz")
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            self.assertLess(len(data), len(transcript) / 10)
+            self.assertEqual(transcript, str(Transcript.from_bytes(gzip.decompress(data))))
+
+    def test_leaves_no_temporary_files(self):
+        with Patcher():
+            cache = TranscriptCache(CACHE_DIR)
+            cache.put("abc", "some transcript")
+            cache.put("abc", "another transcript")
+
+            self.assertEqual(["abc.en.transcript.gz"], os.listdir(CACHE_DIR))
+
+    def test_evicts_least_recently_used_transcripts_when_too_big(self):
+        with Patcher():
+            size = len(gzip.compress(Transcript.from_text("transcript 1").to_bytes()))
+            cache = TranscriptCache(CACHE_DIR, max_bytes=2 * size)
+            cache.put("1", "transcript 1")
+            cache.put("2", "transcript 2")
+            os.utime(os.path.join(CACHE_DIR, "1.en.transcript.gz"), (1000, 1000))
+            os.utime(os.path.join(CACHE_DIR, "2.en.transcript.gz"), (2000, 2000))
+
+            cache.get("1")
+            cache.put("3", "transcript 3")
+
+            self.assertEqual("transcript 1", str(cache.get("1")))
+            self.assertIsNone(cache.get("2"))
+            self.assertEqual("transcript 3", str(cache.get("3")))
+
+if __name__ == '__main__':
+    unittest.main()
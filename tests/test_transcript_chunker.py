@@ -0,0 +1,46 @@
+import unittest
+from transcript_chunker import TranscriptChunker, estimate_tokens
+
+def sentences(count):
+    return " ".join(f"This is sentence number {i}." for i in range(count))
+
+class TestTranscriptChunker(unittest.TestCase):
+
+    def test_keeps_short_texts_in_one_chunk(self):
+        self.assertEqual(["A short transcript."], TranscriptChunker(chunk_tokens=100, overlap_tokens=10).split("A short transcript."))
+
+    def test_splits_long_texts_at_sentence_boundaries(self):
+        chunks = TranscriptChunker(chunk_tokens=50, overlap_tokens=10).split(sentences(40))
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 50)
+            self.assertTrue(chunk.startswith("This is sentence"))
+            self.assertTrue(chunk.endswith("."))
+
+    def test_overlaps_consecutive_chunks(self):
+        chunks = TranscriptChunker(chunk_tokens=50, overlap_tokens=10).split(sentences(40))
+
+        for previous, next in zip(chunks, chunks[1:]):
+            last_sentence = previous.rsplit("This is", 1)[1]
+            self.assertTrue(next.startswith("This is" + last_sentence))
+
+    def test_covers_the_whole_text(self):
+        chunks = TranscriptChunker(chunk_tokens=50, overlap_tokens=10).split(sentences(40))
+
+        for i in range(40):
+            self.assertTrue(any(f"number {i}." in chunk for chunk in chunks))
+
+    def test_splits_unpunctuated_texts_between_words(self):
+        text = " ".join(f"word{i}" for i in range(500))
+
+        chunks = TranscriptChunker(chunk_tokens=50, overlap_tokens=10).split(text)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 50)
+        self.assertEqual(set(text.split()), set(" ".join(chunks).split()))
+        self.assertTrue(chunks[-1].endswith("word499"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from transcript import Transcript
+from transcript_cleaner import TranscriptCleaner
+
+ROLLING_CAPTIONS = [("so today we are", 0.0, 2.0), ("so today we are going to talk", 1.5, 2.0),
+                    ("going to talk about caches", 3.0, 2.0), ("[Music]", 5.0, 3.0), ("about caches and why", 8.0, 2.0)]
+
+class TestTranscriptCleaner(unittest.TestCase):
+
+    def test_removes_the_words_rolling_captions_repeat(self):
+        cleaned = TranscriptCleaner().clean(Transcript.from_segments(ROLLING_CAPTIONS))
+
+        self.assertEqual("so today we are going to talk about caches and why", str(cleaned))
+
+    def test_keeps_the_timing_of_the_remaining_segments(self):
+        cleaned = TranscriptCleaner().clean(Transcript.from_segments(ROLLING_CAPTIONS))
+
+        self.assertEqual([("so today we are", 0.0, 2.0), ("going to talk", 1.5, 2.0), ("about caches", 3.0, 2.0), ("and why", 8.0, 2.0)],
+                         list(cleaned.segments()))
+
+    def test_strips_non_speech_markers_and_html_entities(self):
+        cleaned = TranscriptCleaner().clean("[Applause] rock &amp; roll ♪ la la la ♪ (laughter) is   back [Music]")
+
+        self.assertEqual("rock & roll is back", str(cleaned))
+
+    def test_keeps_a_single_word_said_twice(self):
+        cleaned = TranscriptCleaner().clean(Transcript.from_segments([("I think that", 0, 1), ("that is right", 1, 1)]))
+
+        self.assertEqual("I think that that is right", str(cleaned))
+
+    def test_only_drops_filler_words_when_asked(self):
+        text = "Um, so you know, this is uh really fast"
+
+        self.assertEqual(text, str(TranscriptCleaner().clean(text)))
+        self.assertEqual("so this is really fast", str(TranscriptCleaner(drop_filler=True).clean(text)))
+
+    def test_is_deterministic(self):
+        transcript = Transcript.from_segments(ROLLING_CAPTIONS)
+
+        self.assertEqual(TranscriptCleaner(drop_filler=True).clean(transcript).to_bytes(),
+                         TranscriptCleaner(drop_filler=True).clean(transcript).to_bytes())
+
+if __name__ == '__main__':
+    unittest.main()
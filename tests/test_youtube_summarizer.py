@@ -2,14 +2,31 @@ import unittest
 from approvaltests import verify
 from approvaltests.namer.default_namer_factory import NamerFactory
 import os
-from youtube_summarizer import YoutubeSummarizer, channel_rss_url
+from youtube_summarizer import YoutubeSummarizer, Summarizer, channel_rss_url, MAX_EMAIL_SUMMARIES
+from rate_limiter import RateLimiter
+from batch_jobs import BatchJobs
+from journal import RunJournal
+from email_outbox import EmailOutbox
+from search_index import SearchIndex
+from lazy_service import LazyService
+from metrics import RunMetrics
+from fake_openai_server import FakeOpenAIServer
+from transcript import Transcript
+from transcript_cache import TranscriptCache
+from transcript_cleaner import TranscriptCleaner
+from state_store import StateStore, FAILED
+from feed import FeedFetcher
 from faker import Faker
 import responses
+from responses import matchers
 from pyfakefs.fake_filesystem_unittest import Patcher
 from datetime import datetime, timedelta
 import re
+import threading
+import time
 
 TEST_CHANNEL_ID = "UC_could_be_anything____"
+OTHER_TEST_CHANNEL_ID = "UC_could_be_anything_2__"
 
 class FakeSummarizer:
     def summarize_text(self, text):
@@ -23,15 +40,66 @@ class FakeSummarizer:
         remaining = len(words) - 10
         return f"{first10}... and {remaining} more words"
     
+class FailingSummarizer:
+    def summarize_text(self, text):
+        raise RuntimeError("OpenAI is down")
+
 class FakeTranscription:
+    def __init__(self):
+        self.fetched_video_ids = []
+
     def fetch(self, video_id):
-        Faker.seed(video_id)
+        self.fetched_video_ids.append(video_id)
+        # a generator of its own, concurrent fetches would race on the shared seed
         fake = Faker()
+        fake.seed_instance(video_id)
         return video_id + " " + fake.text(max_nb_chars=200)
     
+class SlowTranscription(FakeTranscription):
+    """Records how many fetches are in flight at the same time"""
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, video_id):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return super().fetch(video_id)
+
+class CountingSummarizer(FakeSummarizer):
+    def __init__(self):
+        self.summarized_texts = []
+
+    def summarize_text(self, text):
+        self.summarized_texts.append(text)
+        return super().summarize_text(text)
+
+class NoisyTranscription(FakeTranscription):
+    def fetch(self, video_id):
+        self.fetched_video_ids.append(video_id)
+        return Transcript.from_segments([("[Music]", 0, 4), ("um so today we", 4, 2), ("so today we talk about caches", 5, 2)])
+
+class TranscriptionFailingOn(FakeTranscription):
+    def __init__(self, failing_video_id):
+        super().__init__()
+        self.failing_video_id = failing_video_id
+
+    def fetch(self, video_id):
+        if video_id == self.failing_video_id:
+            raise RuntimeError("YouTube is down")
+        return super().fetch(video_id)
+
 class FakeEmailService:
     def __init__(self):
         self.sent_email = None
+        self.sent_emails = []
 
     def send(self, to, subject, body):
         self.sent_email = {
@@ -39,18 +107,29 @@ class FakeEmailService:
             'subject': subject,
             'body': body
         }
+        self.sent_emails.append(self.sent_email)
+
+    def close(self):
+        pass
+
+class FailingEmailService(FakeEmailService):
+    def send(self, to, subject, body):
+        raise RuntimeError("SMTP server is down")
 
 class FakeGitRepository:
-    def __init__(self):
+    def __init__(self, succeeds=True):
+        self.succeeds = succeeds
         self.committed_folder = None
         self.commit_message = None
         self._commit_called = False
+        self.commit_count = 0
 
     def commit_and_push(self, folder_path, commit_message):
         self._commit_called = True
+        self.commit_count += 1
         self.committed_folder = folder_path
         self.commit_message = commit_message
-        return True
+        return self.succeeds
 
     def commit_was_called(self):
         return self._commit_called
@@ -72,7 +151,7 @@ def generate_published_date(video_id):
     published_date = base_date - timedelta(days=days_to_subtract)
     return published_date.strftime('%Y-%m-%dT%H:%M:%S+00:00')
 
-def generate_feed_for(video_ids, channel_title = "My Channel"):
+def generate_feed_for(video_ids, channel_title = "My Channel", channel_id = TEST_CHANNEL_ID):
     """Generate RSS feed XML for given video IDs"""
     entries = []
     for video_id in video_ids:
@@ -85,10 +164,10 @@ def generate_feed_for(video_ids, channel_title = "My Channel"):
                         <published>{published}</published>
                     </entry>''')
     
-    # Ensure TEST_CHANNEL_ID starts with "UC" then remove first two chars
-    if not TEST_CHANNEL_ID.startswith("UC"):
-        raise ValueError('TEST_CHANNEL_ID must start with "UC"')
-    channel_id_no_uc = TEST_CHANNEL_ID[2:]
+    # Ensure channel_id starts with "UC" then remove first two chars
+    if not channel_id.startswith("UC"):
+        raise ValueError('channel_id must start with "UC"')
+    channel_id_no_uc = channel_id[2:]
 
     return f'''<?xml version="1.0" encoding="UTF-8"?>
             <feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
@@ -287,6 +366,463 @@ class TestYouTubeSummarizer(unittest.TestCase):
 
             self.assertTrue(self.is_summary_file_present(video_ids[0]))
 
+    @responses.activate
+    def test_concurrent_run_writes_the_same_summaries_and_email_as_a_serial_run(self):
+        """Test that running with many workers produces the same files and email, in feed order"""
+
+        video_ids = build_video_ids(6)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+
+        results = []
+        for max_workers in [1, 4]:
+            fakeEmailer = FakeEmailService()
+            with Patcher() as patcher:
+                YoutubeSummarizer(FakeSummarizer(), SlowTranscription(delay=0.01), fakeEmailer, FakeGitRepository(), wait_between_requests=0,
+                                  max_workers=max_workers, max_concurrent_transcripts=4).run(TEST_CHANNEL_ID, "user@example.com")
+                summaries = [self.read_summary_md_file(TEST_CHANNEL_ID, video_id) for video_id in video_ids]
+            results.append((summaries, fakeEmailer.sent_email))
+
+        self.assertEqual(results[0], results[1])
+
+    @responses.activate
+    def test_caps_concurrent_transcript_fetches(self):
+        """Test that transcript fetches overlap across videos, up to their own concurrency cap"""
+
+        video_ids = build_video_ids(6)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+
+        transcripter = SlowTranscription()
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(FakeSummarizer(), transcripter, FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              max_workers=4, max_concurrent_transcripts=2).run(TEST_CHANNEL_ID, "user@example.com")
+
+        self.assertEqual(2, transcripter.max_in_flight)
+
+    @responses.activate
+    def test_summarizes_many_channels_in_one_run(self):
+        """Test that many channels are summarized in one run, with one email per channel"""
+
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(2), "Dog Channel"))
+        responses.get(channel_rss_url(OTHER_TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(1), "Cat Channel", OTHER_TEST_CHANNEL_ID))
+
+        fakeEmailer = FakeEmailService()
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), fakeEmailer, FakeGitRepository(), wait_between_requests=0).run_channels([TEST_CHANNEL_ID, OTHER_TEST_CHANNEL_ID], "user@example.com")
+
+            self.assertTrue(self.is_summary_file_present("2"))
+            self.assertTrue(os.path.exists(self.summary_file_path(OTHER_TEST_CHANNEL_ID, "1")))
+
+        self.assertEqual(
+            ["🎬 [YouTube Summaries][Cat Channel] " + generate_title_for_video_id("1"),
+             "🎬 [YouTube Summaries][Dog Channel] 2 New Video Summaries Available"],
+            sorted(email['subject'] for email in fakeEmailer.sent_emails))
+
+    @responses.activate
+    def test_commits_all_channels_at_once(self):
+        """Test that summaries from many channels are committed together"""
+
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(2)))
+        responses.get(channel_rss_url(OTHER_TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(1), channel_id=OTHER_TEST_CHANNEL_ID))
+
+        fakeGitRepo = FakeGitRepository()
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), fakeGitRepo, wait_between_requests=0).run_channels(
+                [TEST_CHANNEL_ID, OTHER_TEST_CHANNEL_ID], "user@example.com", commit_summaries=True)
+
+        self.assertEqual(1, fakeGitRepo.commit_count)
+        self.assertEqual([TEST_CHANNEL_ID, OTHER_TEST_CHANNEL_ID], fakeGitRepo.committed_folder)
+        self.assertIn("3 videos from 2 channels", fakeGitRepo.commit_message)
+
+    @responses.activate
+    def test_summarizes_channels_listed_twice_only_once(self):
+        """Test that a channel listed twice is only summarized and emailed once"""
+
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(1)))
+
+        fakeEmailer = FakeEmailService()
+        transcripter = FakeTranscription()
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(FakeSummarizer(), transcripter, fakeEmailer, FakeGitRepository(), wait_between_requests=0).run_channels(
+                [TEST_CHANNEL_ID, TEST_CHANNEL_ID], "user@example.com")
+
+        self.assertEqual(["1"], transcripter.fetched_video_ids)
+        self.assertEqual(1, len(fakeEmailer.sent_emails))
+
+    @responses.activate
+    def test_keeps_summarizing_other_channels_when_one_fails(self):
+        """Test that a failing channel does not prevent the others from being summarized and committed"""
+
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(1)))
+        responses.get(channel_rss_url(OTHER_TEST_CHANNEL_ID), status=500)
+
+        fakeGitRepo = FakeGitRepository()
+
+        with Patcher() as patcher:
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), fakeGitRepo, wait_between_requests=0).run_channels(
+                    [TEST_CHANNEL_ID, OTHER_TEST_CHANNEL_ID], "user@example.com", commit_summaries=True)
+
+            self.assertTrue(self.is_summary_file_present("1"))
+
+        self.assertEqual([TEST_CHANNEL_ID], fakeGitRepo.committed_folder)
+
+    @responses.activate
+    def test_does_not_fetch_transcripts_again_after_a_failed_run(self):
+        """Test that transcripts are cached, so that a run failing to summarize does not fetch them again"""
+
+        video_ids = build_video_ids(2)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+
+        with Patcher() as patcher:
+            transcript_cache = TranscriptCache("cache")
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(FailingSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                                  transcript_cache=transcript_cache).run(TEST_CHANNEL_ID, "user@example.com", max_summaries=1)
+
+            transcripter = FakeTranscription()
+            YoutubeSummarizer(FakeSummarizer(), transcripter, FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              transcript_cache=transcript_cache).run(TEST_CHANNEL_ID, "user@example.com")
+            summary = self.read_summary_md_file(TEST_CHANNEL_ID, video_ids[0])
+
+        self.assertEqual([video_ids[1]], transcripter.fetched_video_ids)
+        self.assertEqual({"hits": 1, "misses": 2}, transcript_cache.stats())
+        verify(summary)
+
+    @responses.activate
+    def test_records_the_state_of_summarized_and_failed_videos(self):
+        """Test that the state store knows which videos were summarized, and which failed"""
+
+        video_ids = build_video_ids(3)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+
+        state_store = StateStore(":memory:")
+        with Patcher() as patcher:
+            self.write_summary_file(video_ids[0], "existing summary")
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              state_store=state_store).run(TEST_CHANNEL_ID, "user@example.com", max_summaries=1)
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(FailingSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                                  state_store=state_store).run(TEST_CHANNEL_ID, "user@example.com", max_summaries=1)
+
+        self.assertEqual({video_ids[0], video_ids[1]}, state_store.summarized_video_ids(TEST_CHANNEL_ID))
+        self.assertIsNotNone(state_store.video(TEST_CHANNEL_ID, video_ids[1])["summary_hash"])
+        failed_video = state_store.video(TEST_CHANNEL_ID, video_ids[2])
+        self.assertEqual((FAILED, "OpenAI is down"), (failed_video["status"], failed_video["error"]))
+
+    @responses.activate
+    def test_exits_early_when_the_feed_did_not_change(self):
+        """Test that a feed answering 304 Not Modified to a conditional request is not processed"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids), headers={"ETag": '"v1"'})
+        responses.get(channel_rss_url(TEST_CHANNEL_ID), status=304,
+                match=[matchers.header_matcher({"If-None-Match": '"v1"'})])
+
+        with Patcher() as patcher:
+            feed_fetcher = FeedFetcher("validators.json")
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              feed_fetcher=feed_fetcher).run(TEST_CHANNEL_ID, "user@example.com")
+            os.remove(self.summary_file_path(TEST_CHANNEL_ID, video_ids[0]))
+
+            fakeEmailer = FakeEmailService()
+            transcripter = FakeTranscription()
+            YoutubeSummarizer(FakeSummarizer(), transcripter, fakeEmailer, FakeGitRepository(), wait_between_requests=0,
+                              feed_fetcher=FeedFetcher("validators.json")).run(TEST_CHANNEL_ID, "user@example.com")
+
+        self.assertEqual([], transcripter.fetched_video_ids)
+        self.assertIsNone(fakeEmailer.sent_email)
+
+    @responses.activate
+    def test_fetches_the_whole_feed_again_after_a_failed_run(self):
+        """Test that the feed validators are only kept once the new videos were summarized"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids), headers={"ETag": '"v1"'})
+
+        with Patcher() as patcher:
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(FailingSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                                  feed_fetcher=FeedFetcher("validators.json")).run(TEST_CHANNEL_ID, "user@example.com")
+
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              feed_fetcher=FeedFetcher("validators.json")).run(TEST_CHANNEL_ID, "user@example.com")
+
+            self.assertTrue(self.is_summary_file_present(video_ids[0]))
+
+        self.assertNotIn("If-None-Match", responses.calls[1].request.headers)
+
+    @responses.activate
+    def test_summarizes_new_videos_through_a_batch_job_collected_by_a_later_run(self):
+        """Test that a batch run submits the new transcripts, and that the next runs write the summaries once the job completed"""
+
+        video_ids = build_video_ids(3)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        fakeEmailer = FakeEmailService()
+        fakeGitRepo = FakeGitRepository()
+
+        with FakeOpenAIServer() as server:
+            summarizer = Summarizer("api-key", rate_limiter=RateLimiter(), base_url=server.base_url)
+            with Patcher():
+                def run():
+                    YoutubeSummarizer(summarizer, FakeTranscription(), fakeEmailer, fakeGitRepo, wait_between_requests=0,
+                                      batch_jobs=BatchJobs(".cache/batches")).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+
+                run()
+                self.assertEqual(1, len(server.batches))
+                self.assertFalse(any(self.is_summary_file_present(video_id) for video_id in video_ids))
+
+                run()
+                self.assertIsNone(fakeEmailer.sent_email)
+
+                server.complete_batches(failing_custom_ids={"2"})
+                run()
+                summary = self.read_summary_md_file(TEST_CHANNEL_ID, "1")
+                self.assertFalse(self.is_summary_file_present("2"))
+                self.assertTrue(self.is_summary_file_present("3"))
+                self.assertEqual(1, fakeGitRepo.commit_count)
+                self.assertEqual(1, len(fakeEmailer.sent_emails))
+
+                run()
+                self.assertEqual(2, len(server.batches))
+                server.complete_batches()
+                run()
+                self.assertTrue(self.is_summary_file_present("2"))
+
+        self.assertIn("summary of 1 ", summary)
+        # the feed is only fetched by the runs submitting a batch job
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_resumes_a_run_that_failed_to_send_its_email(self):
+        """Test that the next run emails and commits the summaries of a run that failed to email them, without summarizing them again"""
+
+        video_ids = build_video_ids(2)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        summarizer = CountingSummarizer()
+        fakeEmailer = FakeEmailService()
+        fakeGitRepo = FakeGitRepository()
+
+        with Patcher():
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(summarizer, FakeTranscription(), FailingEmailService(), fakeGitRepo, wait_between_requests=0,
+                                  journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+            summarized_text_count = len(summarizer.summarized_texts)
+
+            YoutubeSummarizer(summarizer, FakeTranscription(), fakeEmailer, fakeGitRepo, wait_between_requests=0,
+                              journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+
+            self.assertEqual({}, RunJournal(".cache/journals").entries(TEST_CHANNEL_ID))
+
+        # only the meta-summary of the email is made again
+        self.assertEqual(summarized_text_count + 1, len(summarizer.summarized_texts))
+        self.assertIn("2 New Video Summaries Available", fakeEmailer.sent_email["subject"])
+        self.assertEqual(1, fakeGitRepo.commit_count)
+        self.assertEqual("Add summaries for 2 videos from channel My Channel", fakeGitRepo.commit_message)
+
+    @responses.activate
+    def test_resumes_a_run_that_failed_partway_through(self):
+        """Test that the summaries written before a failure are emailed along with the rest by the next run"""
+
+        video_ids = build_video_ids(3)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        fakeEmailer = FakeEmailService()
+        transcription = FakeTranscription()
+
+        with Patcher():
+            with self.assertRaises(RuntimeError):
+                YoutubeSummarizer(FakeSummarizer(), TranscriptionFailingOn("3"), fakeEmailer, FakeGitRepository(), wait_between_requests=0,
+                                  journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com")
+            self.assertIsNone(fakeEmailer.sent_email)
+
+            YoutubeSummarizer(FakeSummarizer(), transcription, fakeEmailer, FakeGitRepository(), wait_between_requests=0,
+                              journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com")
+
+        self.assertEqual(["3"], transcription.fetched_video_ids)
+        self.assertIn("3 New Video Summaries Available", fakeEmailer.sent_email["subject"])
+        self.assertEqual(1, len(fakeEmailer.sent_emails))
+
+    @responses.activate
+    def test_commits_again_after_a_failed_commit_without_emailing_again(self):
+        """Test that summaries which could not be committed are committed by the next run, even without new videos"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids), headers={"ETag": '"v1"'})
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                status=304, match=[matchers.header_matcher({"If-None-Match": '"v1"'})])
+        fakeEmailer = FakeEmailService()
+        fakeGitRepo = FakeGitRepository()
+
+        with Patcher():
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), fakeEmailer, FakeGitRepository(succeeds=False), wait_between_requests=0,
+                              feed_fetcher=FeedFetcher("validators.json"), journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), fakeEmailer, fakeGitRepo, wait_between_requests=0,
+                              feed_fetcher=FeedFetcher("validators.json"), journal=RunJournal(".cache/journals")).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+
+        self.assertEqual(1, fakeGitRepo.commit_count)
+        self.assertEqual(TEST_CHANNEL_ID, fakeGitRepo.committed_folder)
+        self.assertEqual(1, len(fakeEmailer.sent_emails))
+
+    @responses.activate
+    def test_measures_every_stage_and_the_usage_of_each_video(self):
+        """Test that the run metrics time the stages of the run, and attribute tokens and cost to each video"""
+
+        video_ids = build_video_ids(2)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        metrics = RunMetrics()
+
+        with FakeOpenAIServer() as server:
+            summarizer = Summarizer("api-key", rate_limiter=RateLimiter(), base_url=server.base_url)
+            with Patcher():
+                YoutubeSummarizer(summarizer, FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                                  metrics=metrics).run(TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+
+        report = metrics.report()
+        self.assertEqual({"feed_fetch", "feed_parse", "transcript_fetch", "summarize", "meta_summary", "email_render", "email_send", "git"},
+                         set(report["stages"]))
+        self.assertEqual({1}, {report["videos"][video_id]["requests"] for video_id in video_ids})
+        self.assertEqual(summarizer.usage_stats()["input_tokens"], report["totals"]["input_tokens"])
+        self.assertGreater(report["videos"]["1"]["input_tokens"], 0)
+        self.assertGreater(report["videos"]["1"]["transcript_chars"], 0)
+        self.assertEqual(len(generate_feed_for(video_ids).encode('utf-8')), report["totals"]["feed_bytes"])
+
+    @responses.activate
+    def test_delivers_one_digest_for_many_channels_through_an_outbox(self):
+        """Test that with an outbox, the emails of all channels are queued, then merged into a single digest"""
+
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(2), "Dog Channel"))
+        responses.get(channel_rss_url(OTHER_TEST_CHANNEL_ID),
+                body=generate_feed_for(build_video_ids(1), "Cat Channel", OTHER_TEST_CHANNEL_ID))
+        sender = FakeEmailService()
+
+        with Patcher() as patcher:
+            outbox = EmailOutbox("outbox", sender, digest_subject="{count} channels")
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), outbox, FakeGitRepository(), wait_between_requests=0).run_channels(
+                [TEST_CHANNEL_ID, OTHER_TEST_CHANNEL_ID], "user@example.com")
+            pending = outbox.pending()
+
+        self.assertEqual(["2 channels"], [email['subject'] for email in sender.sent_emails])
+        self.assertIn("Dog Channel", sender.sent_email['body'])
+        self.assertIn("Cat Channel", sender.sent_email['body'])
+        self.assertEqual([], pending)
+
+    @responses.activate
+    def test_keeps_the_email_in_the_outbox_when_the_smtp_server_fails(self):
+        """Test that a failing SMTP server does not fail the run, the email waiting in the outbox for the next one"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        fakeGitRepo = FakeGitRepository()
+
+        with Patcher() as patcher:
+            outbox = EmailOutbox("outbox", FailingEmailService())
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), outbox, fakeGitRepo, wait_between_requests=0).run(
+                TEST_CHANNEL_ID, "user@example.com", commit_summaries=True)
+            pending = outbox.pending()
+
+        self.assertTrue(fakeGitRepo._commit_called)
+        self.assertEqual(["user@example.com"], [email["to"] for _, email in pending])
+
+    @responses.activate
+    def test_indexes_the_summaries_it_writes(self):
+        """Test that the summaries written by a run can be searched straight away"""
+
+        video_ids = build_video_ids(2)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        search_index = SearchIndex(":memory:")
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(FakeSummarizer(), FakeTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              search_index=search_index).run(TEST_CHANNEL_ID, "user@example.com")
+
+        results = search_index.search(generate_title_for_video_id(video_ids[1]))
+        self.assertEqual(video_ids[1], results[0]["video_id"])
+        self.assertEqual(TEST_CHANNEL_ID, results[0]["channel_id"])
+        self.assertEqual(2, search_index.count())
+
+    @responses.activate
+    def test_does_not_build_the_summarizer_when_nothing_is_new(self):
+        """Test that lazy services are left alone by a run finding no new videos"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        summarizer = LazyService(FakeSummarizer)
+        transcripter = LazyService(FakeTranscription)
+
+        with Patcher() as patcher:
+            self.write_summary_file(video_ids[0], "existing summary")
+            YoutubeSummarizer(summarizer, transcripter, FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              transcript_cache=LazyService(lambda: TranscriptCache("cache"))).run(TEST_CHANNEL_ID, "user@example.com")
+
+        self.assertFalse(summarizer.is_built)
+        self.assertFalse(transcripter.is_built)
+
+    @responses.activate
+    def test_reduces_the_meta_summary_of_a_large_backlog_as_a_tree(self):
+        """Test that the meta-summary of many videos is built from prompts of bounded size, and that the email links the videos beyond the first ones"""
+
+        video_ids = build_video_ids(MAX_EMAIL_SUMMARIES + 2)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        summarizer = CountingSummarizer()
+        fakeEmailer = FakeEmailService()
+
+        with Patcher() as patcher:
+            YoutubeSummarizer(summarizer, FakeTranscription(), fakeEmailer, FakeGitRepository(), wait_between_requests=0,
+                              meta_summary_tokens=200).run(TEST_CHANNEL_ID, "user@example.com")
+
+        meta_summary_prompts = summarizer.summarized_texts[len(video_ids):]
+        self.assertGreater(len(meta_summary_prompts), 2)
+        self.assertTrue(all(len(prompt) < 2 * 200 * 4 for prompt in meta_summary_prompts))
+        body = fakeEmailer.sent_email['body']
+        self.assertIn("At a glance", body)
+        self.assertIn("And 2 more videos", body)
+        self.assertIn(f'href="https://www.youtube.com/watch?v={video_ids[-1]}"', body)
+        self.assertEqual(f"🎬 [YouTube Summaries][My Channel] {len(video_ids)} New Video Summaries Available", fakeEmailer.sent_email['subject'])
+
+    @responses.activate
+    def test_summarizes_the_cleaned_transcript_and_reports_the_tokens_saved(self):
+        """Test that transcripts are cleaned before summarization, and that the token reduction is measured per video"""
+
+        video_ids = build_video_ids(1)
+        responses.get(channel_rss_url(TEST_CHANNEL_ID),
+                body=generate_feed_for(video_ids))
+        summarizer = CountingSummarizer()
+        metrics = RunMetrics()
+
+        with Patcher():
+            YoutubeSummarizer(summarizer, NoisyTranscription(), FakeEmailService(), FakeGitRepository(), wait_between_requests=0,
+                              metrics=metrics, transcript_cleaner=TranscriptCleaner(drop_filler=True)).run(TEST_CHANNEL_ID, "user@example.com")
+
+        self.assertEqual(["so today we talk about caches"], summarizer.summarized_texts)
+        video = metrics.report()["videos"][video_ids[0]]
+        self.assertGreater(video["transcript_tokens"], video["cleaned_transcript_tokens"])
+
     def is_summary_file_present(self, video_id):
         return os.path.exists(self.summary_file_path(TEST_CHANNEL_ID, video_id))
 
@@ -0,0 +1,158 @@
+# Compact transcript: one text buffer, with the offset and timing of every segment in arrays
+
+import bisect
+import io
+import struct
+import sys
+from array import array
+from transcript_chunker import CHARACTERS_PER_TOKEN
+
+MAGIC = b"YTT1"
+HEADER = struct.Struct("<4sI")
+SEPARATOR = " "
+
+def timestamp_url(url, seconds):
+    """Link to a video at the given time."""
+    return f"{url}&t={int(seconds)}s"
+
+class Transcript:
+    """Segments of a transcript joined by spaces in a single string, like the flat transcripts used so far.
+
+    The character offset, start and duration of each segment are kept in arrays, so that timestamps cost
+    a few bytes per segment. Slicing by time or by token budget returns views over the same buffer and
+    arrays, the text of a view is only copied when it is turned into a string.
+    """
+
+    def __init__(self, text, offsets, starts, durations, first=0, last=None):
+        self.buffer = text
+        self.offsets = offsets
+        self.starts = starts
+        self.durations = durations
+        self.first = first
+        self.last = len(offsets) if last is None else last
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a transcript from (text, start, duration) segments, in a single pass."""
+        text = io.StringIO()
+        offsets, starts, durations = array('I'), array('f'), array('f')
+        position = 0
+        for segment_text, start, duration in segments:
+            if offsets:
+                position += text.write(SEPARATOR)
+            offsets.append(position)
+            starts.append(start)
+            durations.append(duration)
+            position += text.write(segment_text)
+        return cls(text.getvalue(), offsets, starts, durations)
+
+    @classmethod
+    def from_text(cls, text):
+        """A transcript of a single segment, without timings."""
+        return cls.from_segments([(text, 0, 0)])
+
+    def __str__(self):
+        start, end = self.__text_range()
+        if start == 0 and end == len(self.buffer):
+            return self.buffer
+        return self.buffer[start:end]
+
+    def __len__(self):
+        start, end = self.__text_range()
+        return end - start
+
+    def __repr__(self):
+        return f"Transcript({len(self)} characters, {self.segment_count} segments)"
+
+    @property
+    def segment_count(self):
+        return self.last - self.first
+
+    @property
+    def start_time(self):
+        return self.starts[self.first] if self.segment_count else 0.0
+
+    @property
+    def end_time(self):
+        if not self.segment_count:
+            return 0.0
+        return max(self.starts[i] + self.durations[i] for i in range(self.first, self.last))
+
+    def segments(self):
+        for i in range(self.first, self.last):
+            yield self.__segment_text(i), self.starts[i], self.durations[i]
+
+    def slice_time(self, start, end):
+        """View of the segments starting in [start, end) seconds."""
+        first = bisect.bisect_left(self.starts, start, self.first, self.last)
+        last = bisect.bisect_left(self.starts, end, first, self.last)
+        return self.__view(first, last)
+
+    def split_tokens(self, max_tokens):
+        """Views of consecutive segments of at most max_tokens each, a longer segment being a view of its own."""
+        views = []
+        first = self.first
+        while first < self.last:
+            last = first + 1
+            while last < self.last and self.__range_length(first, last + 1) <= max_tokens * CHARACTERS_PER_TOKEN:
+                last += 1
+            views.append(self.__view(first, last))
+            first = last
+        return views
+
+    def time_at(self, offset):
+        """Start time of the segment containing the character at offset in this transcript."""
+        if not self.segment_count:
+            return 0.0
+        position = self.offsets[self.first] + offset
+        i = bisect.bisect_right(self.offsets, position, self.first, self.last) - 1
+        return self.starts[max(i, self.first)]
+
+    def to_bytes(self):
+        """Compact binary form: header, arrays of offsets, starts and durations, then the UTF-8 text."""
+        base = self.offsets[self.first] if self.segment_count else 0
+        offsets = array('I', (offset - base for offset in self.offsets[self.first:self.last]))
+        starts = self.starts[self.first:self.last]
+        durations = self.durations[self.first:self.last]
+        if sys.byteorder == "big":
+            for values in (offsets, starts, durations):
+                values.byteswap()
+        return b"".join([HEADER.pack(MAGIC, self.segment_count), offsets.tobytes(), starts.tobytes(),
+                         durations.tobytes(), str(self).encode('utf-8')])
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a transcript.")
+
+        position = HEADER.size
+        arrays = []
+        for typecode in ('I', 'f', 'f'):
+            values = array(typecode)
+            size = count * values.itemsize
+            values.frombytes(data[position:position + size])
+            if sys.byteorder == "big":
+                values.byteswap()
+            arrays.append(values)
+            position += size
+        return cls(data[position:].decode('utf-8'), *arrays)
+
+    def __view(self, first, last):
+        return Transcript(self.buffer, self.offsets, self.starts, self.durations, first, last)
+
+    def __segment_text(self, i):
+        return self.buffer[self.offsets[i]:self.__segment_end(i)]
+
+    def __segment_end(self, i):
+        if i + 1 < len(self.offsets):
+            return self.offsets[i + 1] - len(SEPARATOR)
+        return len(self.buffer)
+
+    def __range_length(self, first, last):
+        return self.__segment_end(last - 1) - self.offsets[first]
+
+    def __text_range(self):
+        if not self.segment_count:
+            return 0, 0
+        return self.offsets[self.first], self.__segment_end(self.last - 1)
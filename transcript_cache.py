@@ -0,0 +1,91 @@
+# On-disk cache of video transcripts, so that a failed run does not fetch them again from YouTube
+
+import gzip
+import os
+import tempfile
+import threading
+from transcript import Transcript
+
+class TranscriptCache:
+    """Gzipped transcripts in their compact binary form, stored as <directory>/<video_id>.<language>.transcript.gz
+
+    Transcripts given as plain strings are stored without timings. Files are written atomically, and the least recently used ones are evicted once the
+    cache grows over max_bytes (files are touched on every hit).
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, video_id, language="en"):
+        path = self.__path(video_id, language)
+        try:
+            with open(path, 'rb') as f:
+                transcript = Transcript.from_bytes(gzip.decompress(f.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return transcript
+
+    def put(self, video_id, transcript, language="en"):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.__path(video_id, language)
+        if not isinstance(transcript, Transcript):
+            transcript = Transcript.from_text(transcript)
+        data = gzip.compress(transcript.to_bytes())
+
+        with self.lock:
+            self.__ensure_size_is_known()
+            self.size -= self.__file_size(path)
+
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+
+            self.size += len(data)
+            self.__evict()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def __evict(self):
+        if self.size <= self.max_bytes:
+            return
+
+        entries = sorted(self.__cached_files(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def __ensure_size_is_known(self):
+        if self.size is None:
+            self.size = sum(entry.stat().st_size for entry in self.__cached_files())
+
+    def __cached_files(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(".transcript.gz")]
+
+    def __file_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def __path(self, video_id, language):
+        return os.path.join(self.directory, f"{video_id}.{language}.transcript.gz")
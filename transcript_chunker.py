@@ -0,0 +1,79 @@
+# Splits long transcripts into overlapping chunks that fit in an LLM prompt
+
+import re
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# about 4 characters per token in English
+CHARACTERS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Rough token count, good enough to size prompts."""
+    return (len(text) + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN
+
+class TranscriptChunker:
+    """Splits text at sentence boundaries into chunks of at most chunk_tokens tokens.
+
+    Each chunk starts with the last sentences of the previous one, up to overlap_tokens tokens, so that
+    no idea is cut in half. Auto-generated transcripts often have no punctuation at all, in which
+    case sentences are made of as many words as fit in a chunk.
+    """
+
+    def __init__(self, chunk_tokens=12000, overlap_tokens=150):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def fits(self, text):
+        return estimate_tokens(text) <= self.chunk_tokens
+
+    def split(self, text):
+        if self.fits(text):
+            return [text]
+
+        chunks = []
+        chunk = []
+        chunk_tokens = 0
+        for sentence in self.__sentences(text):
+            sentence_tokens = estimate_tokens(sentence) + 1
+            if chunk and chunk_tokens + sentence_tokens > self.chunk_tokens:
+                chunks.append(" ".join(chunk))
+                chunk = self.__overlap(chunk)
+                chunk_tokens = sum(estimate_tokens(s) + 1 for s in chunk)
+            chunk.append(sentence)
+            chunk_tokens += sentence_tokens
+
+        chunks.append(" ".join(chunk))
+        return chunks
+
+    def __overlap(self, chunk):
+        overlap = []
+        overlap_tokens = 0
+        for sentence in reversed(chunk):
+            overlap_tokens += estimate_tokens(sentence) + 1
+            if overlap_tokens > self.overlap_tokens:
+                break
+            overlap.insert(0, sentence)
+        return overlap
+
+    def __sentences(self, text):
+        # leave room for the overlap, so that a chunk always has space for a new sentence
+        max_sentence_tokens = self.chunk_tokens - self.overlap_tokens - 1
+        for sentence in SENTENCE_END.split(text):
+            if estimate_tokens(sentence) <= max_sentence_tokens:
+                yield sentence
+                continue
+
+            words = []
+            words_tokens = 0
+            for word in sentence.split():
+                word_tokens = estimate_tokens(word) + 1
+                if words and words_tokens + word_tokens > max_sentence_tokens:
+                    yield " ".join(words)
+                    words = []
+                    words_tokens = 0
+                words.append(word)
+                words_tokens += word_tokens
+            if words:
+                yield " ".join(words)
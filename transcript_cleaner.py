@@ -0,0 +1,59 @@
+# Cleans auto-generated transcripts before summarization, to spend fewer tokens on noise
+
+import html
+import re
+from transcript import Transcript
+
+# [Music], [Applause], (laughter), ♪ lyrics ♪...
+NON_SPEECH = re.compile(r'\[[^\]]*\]|\((?:music|applause|laughter|laughs|inaudible|silence)[^)]*\)|♪[^♪]*♪|[♪♫]', re.IGNORECASE)
+FILLER_WORDS = ["um", "umm", "uh", "uhh", "uhm", "erm", "er", "ah", "hmm", "mm", "mhm", "you know", "i mean"]
+# how far back a caption line is compared with the ones before it
+MAX_OVERLAP_WORDS = 30
+# a single repeated word is often meant ("that that"), unless it is the whole line
+MIN_OVERLAP_WORDS = 2
+
+class TranscriptCleaner:
+    """Deterministic clean up of transcripts, keeping the timing of every segment.
+
+    Strips non-speech markers, unescapes HTML entities, normalises whitespace, and removes the words a
+    rolling caption line repeats from the previous ones. Filler words are only dropped with drop_filler,
+    as they sometimes carry meaning.
+    """
+
+    def __init__(self, drop_filler=False, filler_words=FILLER_WORDS):
+        self.drop_filler = drop_filler
+        alternatives = "|".join(re.escape(word).replace(r"\ ", r"\s+") for word in sorted(filler_words, key=len, reverse=True))
+        self.filler = re.compile(rf"\b(?:{alternatives})\b[,.]?\s*", re.IGNORECASE)
+
+    def clean(self, transcript):
+        if not isinstance(transcript, Transcript):
+            transcript = Transcript.from_text(transcript)
+
+        segments = []
+        previous_words = []
+        for text, start, duration in transcript.segments():
+            words = self.__clean_text(text).split()
+            words = words[self.__overlap(previous_words, words):]
+            if not words:
+                continue
+            previous_words = (previous_words + words)[-MAX_OVERLAP_WORDS:]
+            segments.append((" ".join(words), start, duration))
+        return Transcript.from_segments(segments)
+
+    def __clean_text(self, text):
+        text = NON_SPEECH.sub(" ", html.unescape(text))
+        if self.drop_filler:
+            text = self.filler.sub("", text)
+        return text
+
+    def __overlap(self, previous_words, words):
+        """Number of leading words repeating the end of the previous ones."""
+        previous_keys = [self.__key(word) for word in previous_words]
+        keys = [self.__key(word) for word in words[:MAX_OVERLAP_WORDS]]
+        for length in range(min(len(previous_keys), len(keys)), 0, -1):
+            if (length >= MIN_OVERLAP_WORDS or length == len(words)) and previous_keys[-length:] == keys[:length]:
+                return length
+        return 0
+
+    def __key(self, word):
+        return word.strip(".,!?;:\"'").lower()
@@ -3,249 +3,882 @@
 import os
 from dotenv import load_dotenv
 import sys
-import openai
-from youtube_transcript_api import YouTubeTranscriptApi
-import requests
-import xml.etree.ElementTree as ET
-import yagmail
-import markdown
-import subprocess
 import time
+import threading
+import itertools
+import hashlib
+import io
+import json
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+from lazy_service import LazyService
+from transcript_cache import TranscriptCache
+from summary_cache import SummaryCache
+from transcript_chunker import TranscriptChunker, estimate_tokens
+from transcript_cleaner import TranscriptCleaner
+from email_outbox import EmailOutbox, SmtpSender
+from search_index import SearchIndex, parse_summary
+from meta_summary import TreeSummarizer
+from transcript import Transcript
+from feed import ChannelFeed, FeedFetcher, channel_rss_url
+from batch_jobs import BatchJobs
+from git_repository import GitRepository
+from metrics import RunMetrics
+from journal import RunJournal, FETCHED, SUMMARIZED, WRITTEN, EMAILED, reached
+from state_store import StateStore, IN_PROGRESS, SUMMARIZED, FAILED
+
+# openai, youtube_transcript_api, markdown and asyncio take most of the startup time: they are imported where used,
+# so that a run with nothing new to summarize does not load them
+
+def openai_rate_limiter():
+    import openai
+    return RateLimiter(rate=1, burst=5, base_delay=2, max_delay=60,
+                       retry_on=(openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError))
+
+def youtube_rate_limiter(state_path=None):
+    from youtube_transcript_api import RequestBlocked, YouTubeRequestFailed
+    # YouTube bans IPs that fetch too many transcripts, so pace slowly and stop at the first ban
+    return RateLimiter(rate=1/10, burst=1, base_delay=30, max_delay=600,
+                       retry_on=(YouTubeRequestFailed,), ban_on=(RequestBlocked,), ban_threshold=1, ban_cooldown=6*3600,
+                       state_path=state_path)
 
 class Summarizer:
-    def __init__(self, api_key):
+    MODEL = "gpt-3.5-turbo"
+    # gpt-3.5-turbo has a 16k tokens context window, keep room for the prompt and the response
+    MAX_TRANSCRIPT_TOKENS = 12000
+    # dollars per million tokens of MODEL
+    PRICES = {"input": 0.50, "output": 1.50}
+    PROMPT_TEMPLATE = "Summarize the following transcript:\n{text}"
+    CHUNK_PROMPT_TEMPLATE = "Summarize the following part of a longer transcript:\n{text}"
+    COMBINE_PROMPT_TEMPLATE = "The following are summaries of consecutive parts of a transcript. Combine them into a single summary:\n{text}"
+
+    # seconds for a request to be answered, after which it fails (and is retried)
+    REQUEST_DEADLINE = 120
+
+    def __init__(self, api_key, rate_limiter=None, cache=None, client=None, base_url=None,
+                 chunk_tokens=MAX_TRANSCRIPT_TOKENS, chunk_overlap_tokens=150, max_fanout=4, max_in_flight=4, backend=None):
         self.api_key = api_key
-        openai.api_key = self.api_key
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter or openai_rate_limiter()
+        self.cache = cache
+        if client is None:
+            import openai
+            # a single client for all requests, reusing its pooled connections
+            client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=self.REQUEST_DEADLINE)
+        self.client = client
+        # summaries are requested from the backend when given, such as a HedgedBackend, and from client otherwise
+        self.backend = backend
+        self.chunker = TranscriptChunker(chunk_tokens, chunk_overlap_tokens)
+        self.max_fanout = max_fanout
+        self.max_in_flight = max_in_flight
+        # bounds the requests to the API, whatever the number of videos and chunks summarized at once
+        self.request_slots = threading.BoundedSemaphore(max_in_flight)
+        self.usage_lock = threading.Lock()
+        self.usage = []
+        self.usage_labels = threading.local()
     
     def summarize_text(self, text):
-        client = openai.OpenAI()
+        # short transcripts fit in a single prompt
+        if self.chunker.fits(text):
+            return self.__complete(self.PROMPT_TEMPLATE, text)
+
+        return self.__map_reduce(self.chunker.split(text))
+
+    def summarize_many(self, texts, max_in_flight=None):
+        """Summarize texts with concurrent async requests, at most max_in_flight at a time, returning summaries in input order.
+
+        Must not be called from a running event loop.
+        """
+        import asyncio
+        return asyncio.run(self.__summarize_many(texts, max_in_flight or self.max_in_flight))
+
+    def submit_batch(self, items):
+        """Submit (custom_id, text) items as a batch job, returning its ID.
+
+        Batch jobs are cheaper but slower, only texts fitting in a single prompt can be submitted.
+        """
+        lines = []
+        for custom_id, text in items:
+            if not self.chunker.fits(text):
+                raise ValueError(f"Text '{custom_id}' is too long to be summarized in a batch job.")
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {"model": self.MODEL, "input": self.PROMPT_TEMPLATE.format(text=text)}
+            }))
+
+        input_file = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode('utf-8')), purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint="/v1/responses", completion_window="24h")
+        return batch.id
+
+    def batch_results(self, batch_id):
+        """Summaries of a completed batch job by custom_id, or None if it is still running. Failed requests are missing."""
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing"):
+            return None
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch job {batch_id} ended as {batch.status}.")
+        if batch.output_file_id is None:
+            return {}
+
+        results = {}
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            results[result["custom_id"]] = "".join(
+                content["text"]
+                for output in response["body"].get("output", []) if output.get("type") == "message"
+                for content in output.get("content", []) if content.get("type") == "output_text")
+        return results
+
+    @contextmanager
+    def usage_scope(self, label):
+        """Label the usage of the requests made by the current thread (and its fan-out), to tell it apart in usage_stats."""
+        previous_label = getattr(self.usage_labels, "label", None)
+        self.usage_labels.label = label
+        try:
+            yield
+        finally:
+            self.usage_labels.label = previous_label
+
+    def usage_stats(self, label=None):
+        """Requests, tokens, estimated cost, retries and cache hits, of every request or only the ones with label."""
+        with self.usage_lock:
+            usage = [request for request in self.usage if label is None or request["label"] == label]
+        requests = [request for request in usage if not request["cached"]]
+        latencies = sorted(request["latency"] for request in requests)
+        input_tokens = sum(request["input_tokens"] for request in requests)
+        output_tokens = sum(request["output_tokens"] for request in requests)
+        return {
+            "requests": len(requests),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": (input_tokens * self.PRICES["input"] + output_tokens * self.PRICES["output"]) / 1_000_000,
+            "retries": sum(request["retries"] for request in requests),
+            "hedged": sum(request["hedged"] for request in requests),
+            "cache_hits": len(usage) - len(requests),
+            "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+    async def __summarize_many(self, texts, max_in_flight):
+        # async clients are bound to their event loop, so they only live for one batch
+        import asyncio
+        import openai
+        async with openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url) as async_client:
+            in_flight = asyncio.Semaphore(max_in_flight)
+
+            async def summarize(text):
+                if not self.chunker.fits(text):
+                    return await asyncio.to_thread(self.summarize_text, text)
+
+                cached_response = self.__cached_response(self.PROMPT_TEMPLATE, text)
+                if cached_response is not None:
+                    self.__record_cache_hit()
+                    return cached_response
+
+                async with in_flight:
+                    await asyncio.to_thread(self.rate_limiter.acquire)
+                    start = time.monotonic()
+                    response = await async_client.responses.create(model=self.MODEL, input=self.PROMPT_TEMPLATE.format(text=text))
+                    self.__record_usage(start, response, retries=0)
+
+                self.__cache_response(self.PROMPT_TEMPLATE, text, response.output_text)
+                return response.output_text
+
+            return await asyncio.gather(*[summarize(text) for text in texts])
+
+    def __map_reduce(self, chunks):
+        start = time.monotonic()
+        chunk_summaries = self.__in_parallel(lambda chunk: self.__complete(self.CHUNK_PROMPT_TEMPLATE, chunk), chunks)
+        map_duration = time.monotonic() - start
+
+        start = time.monotonic()
+        summary = self.__combine(chunk_summaries)
+        reduce_duration = time.monotonic() - start
+
+        print(f"Summarized {len(chunks)} transcript chunks in {map_duration:.1f}s, combined them in {reduce_duration:.1f}s.")
+        return summary
+
+    def __combine(self, summaries):
+        if len(summaries) == 1:
+            return summaries[0]
+
+        joined_summaries = "\n\n".join(summaries)
+        if self.chunker.fits(joined_summaries):
+            return self.__complete(self.COMBINE_PROMPT_TEMPLATE, joined_summaries)
 
-        response = client.responses.create(
-            model = "gpt-3.5-turbo",
-            input = f"Summarize the following transcript:\n{text}"
-        )
+        # too many summaries for one prompt, combine them by groups first
+        return self.__combine(self.__in_parallel(self.__combine_group, self.__group(summaries)))
+
+    def __combine_group(self, summaries):
+        if len(summaries) == 1:
+            return summaries[0]
+        return self.__complete(self.COMBINE_PROMPT_TEMPLATE, "\n\n".join(summaries))
+
+    def __group(self, summaries):
+        # groups have at least 2 summaries, so that every round makes progress
+        groups = [[]]
+        for summary in summaries:
+            if len(groups[-1]) >= 2 and not self.chunker.fits("\n\n".join(groups[-1] + [summary])):
+                groups.append([])
+            groups[-1].append(summary)
+        return groups
+
+    def __in_parallel(self, function, items):
+        label = getattr(self.usage_labels, "label", None)
+
+        def labeled_function(item):
+            with self.usage_scope(label):
+                return function(item)
+
+        with ThreadPoolExecutor(max_workers=self.max_fanout) as executor:
+            return list(executor.map(labeled_function, items))
+
+    def __complete(self, prompt_template, text):
+        cached_response = self.__cached_response(prompt_template, text)
+        if cached_response is not None:
+            self.__record_cache_hit()
+            return cached_response
+
+        with self.request_slots:
+            start = time.monotonic()
+            response = self.rate_limiter.call(
+                self.client.responses.create if self.backend is None else self.backend.create,
+                model = self.MODEL,
+                input = prompt_template.format(text=text)
+            )
+            self.__record_usage(start, response, retries=self.rate_limiter.last_call_retries(),
+                                hedged=self.backend is not None and self.backend.last_call_hedged())
+
+        self.__cache_response(prompt_template, text, response.output_text)
         return response.output_text
 
+    def __cached_response(self, prompt_template, text):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.MODEL, prompt_template, text)
+
+    def __cache_response(self, prompt_template, text, response_text):
+        if self.cache is not None:
+            self.cache.put(self.MODEL, prompt_template, text, response_text)
+
+    def __record_usage(self, start, response, retries, hedged=False):
+        usage = getattr(response, "usage", None)
+        self.__append_usage({
+            "cached": False,
+            "latency": time.monotonic() - start,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "retries": retries,
+            "hedged": hedged,
+        })
+
+    def __record_cache_hit(self):
+        self.__append_usage({"cached": True})
+
+    def __append_usage(self, request):
+        request["label"] = getattr(self.usage_labels, "label", None)
+        with self.usage_lock:
+            self.usage.append(request)
+
 
 class YoutubeTranscription:
+    def __init__(self, language="en", rate_limiter=None):
+        self.language = language
+        self.rate_limiter = rate_limiter or youtube_rate_limiter()
+
     def fetch(self, video_id):
-        """Fetch transcript as a single string."""
-        transcript = YouTubeTranscriptApi().fetch(video_id)
-        return " ".join([entry['text'] for entry in transcript.to_raw_data()])
+        """Fetch transcript, with the timing of each snippet."""
+        from youtube_transcript_api import YouTubeTranscriptApi
+        transcript = self.rate_limiter.call(YouTubeTranscriptApi().fetch, video_id, languages=[self.language])
+        return Transcript.from_segments((snippet.text, snippet.start, snippet.duration) for snippet in transcript)
 
-class GitRepository:
-    def commit_and_push(self, folder_path, commit_message):
-        try:
-            subprocess.run(['git', 'add', folder_path], check=True)
-            subprocess.run(['git', 'commit', '-m', commit_message], check=True)
-            subprocess.run(['git', 'push'], check=True)
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Git operation failed: {e}")
-            return False
+def content_hash(text):
+    return hashlib.sha256(str(text).encode('utf-8')).hexdigest()
 
-def channel_rss_url(channel_id):
-    return f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+# summaries included in full in an email, the next ones are linked
+MAX_EMAIL_SUMMARIES = 50
 
 class YoutubeSummarizer:
         
-    def __init__(self, summarizer, transcripter, email_service, git_repo, wait_between_requests=30):
+    def __init__(self, summarizer, transcripter, email_service, git_repo, wait_between_requests=0,
+                 max_workers=1, max_concurrent_transcripts=1, max_concurrent_summaries=4, transcript_cache=None,
+                 state_store=None, feed_fetcher=None, batch_jobs=None, journal=None, metrics=None, transcript_cleaner=None,
+                 search_index=None, meta_summary_tokens=None):
         self.summarizer = summarizer
         self.transcript_service = transcripter
+        self.transcript_cache = transcript_cache
+        # cached transcripts stay raw, so that changing the cleaning does not need fetching them again
+        self.transcript_cleaner = transcript_cleaner
         self.email_service = email_service
         self.git_repo = git_repo
+        self.state_store = state_store
+        # indexed as they are written, so that the search index never needs to scan the folders after a run
+        self.search_index = search_index
+        self.feed_fetcher = feed_fetcher or FeedFetcher()
+        # with batch jobs, new videos are submitted in one batch job, and summarized by a later run
+        self.batch_jobs = batch_jobs
+        self.journal = journal
+        self.metrics = metrics or RunMetrics()
+        # fixed pause after each transcript fetch, on top of the services' own rate limiters
         self.wait_between_requests = wait_between_requests
+        self.max_workers = max_workers
+        # each upstream gets its own cap, whatever the number of workers
+        self.transcript_slots = threading.BoundedSemaphore(max_concurrent_transcripts)
+        self.summary_slots = threading.BoundedSemaphore(max_concurrent_summaries)
+        self.max_concurrent_summaries = max_concurrent_summaries
+        # prompt size of the meta-summary, whose summaries are reduced as a tree when they do not fit
+        self.meta_summary_tokens = meta_summary_tokens or Summarizer.MAX_TRANSCRIPT_TOKENS
 
     def run(self, channel_id_or_file_path, email, commit_summaries=False, max_summaries=None):
-        # Get XML feed string from either local file or URL
-        xml_feed_string = self.__get_channel_feed_xml_string(channel_id_or_file_path)
-        
-        # Extract common data from channel_info
-        channel_info = self.__get_channel_title_and_videos_infos_from_xml(xml_feed_string)
-        channel_id = channel_info["channel_id"]
-        channel_title = channel_info["title"]
-        video_infos = channel_info["video_infos"]
-        
-        print(f"Found {len(video_infos)} videos in channel {channel_id}.")
+        try:
+            summarized_channel = self.__summarize_channel(channel_id_or_file_path, email, max_summaries)
+            if summarized_channel is None:
+                return
+
+            committed = True
+            if commit_summaries:
+                print("Committing summaries to git...")
+                with self.metrics.stage("git"):
+                    committed = self.git_repo.commit_and_push(summarized_channel["channel_id"], f"Add summaries for {summarized_channel['count']} videos from channel {summarized_channel['title']}")
+            if committed:
+                self.__clear_journal(channel_id_or_file_path)
+
+            self.__print_run_report()
+        finally:
+            self.__deliver_emails()
+
+    def run_channels(self, channel_ids_or_file_paths, email, commit_summaries=False, max_summaries=None, max_parallel_channels=4):
+        """Summarize many channels in parallel, sending one email per channel, and committing them all at once."""
+        # the same channel summarized twice at the same time would race on its summary files
+        channel_ids_or_file_paths = list(dict.fromkeys(channel_ids_or_file_paths))
+
+        with ThreadPoolExecutor(max_workers=max_parallel_channels) as executor:
+            futures = [(channel_id_or_file_path, executor.submit(self.__summarize_channel, channel_id_or_file_path, email, max_summaries))
+                       for channel_id_or_file_path in channel_ids_or_file_paths]
+        # the emails of all channels go out together, before the commit
+        self.__deliver_emails()
+
+        summarized_channels = []
+        summarized_keys = []
+        failures = []
+        for channel_id_or_file_path, future in futures:
+            try:
+                summarized_channel = future.result()
+                if summarized_channel is not None:
+                    summarized_channels.append(summarized_channel)
+                    summarized_keys.append(channel_id_or_file_path)
+            except Exception as e:
+                print(f"Failed to summarize '{channel_id_or_file_path}': {e}")
+                failures.append(channel_id_or_file_path)
+
+        committed = True
+        if commit_summaries and summarized_channels:
+            print("Committing summaries to git...")
+            video_count = sum(summarized_channel["count"] for summarized_channel in summarized_channels)
+            with self.metrics.stage("git"):
+                committed = self.git_repo.commit_and_push([summarized_channel["channel_id"] for summarized_channel in summarized_channels],
+                                                          f"Add summaries for {video_count} videos from {len(summarized_channels)} channels")
+        if committed:
+            for channel_id_or_file_path in summarized_keys:
+                self.__clear_journal(channel_id_or_file_path)
+
+        if summarized_channels:
+            self.__print_run_report()
+
+        if failures:
+            raise RuntimeError(f"Failed to summarize {len(failures)} of {len(futures)} channels: {', '.join(failures)}")
+
+    def __summarize_channel(self, channel_id_or_file_path, email, max_summaries):
+        """Summarize and email the new videos of a channel, returning what was summarized, or None if nothing was new."""
+        if self.batch_jobs is not None:
+            batch_job = self.batch_jobs.load(channel_id_or_file_path)
+            if batch_job is not None:
+                return self.__collect_batch_job(channel_id_or_file_path, batch_job, email)
+
+        journal_entries = self.journal.entries(channel_id_or_file_path) if self.journal is not None else {}
+        # summaries written by a failed run, still to be emailed or committed
+        resumed_entries = [entry for entry in journal_entries.values() if reached(entry, WRITTEN)]
+
+        feed_file = self.__open_channel_feed(channel_id_or_file_path)
+        if feed_file is None:
+            print(f"Feed of channel {channel_id_or_file_path} did not change since last run.")
+            if not resumed_entries:
+                return None
+            channel_id = resumed_entries[0]["channel_id"]
+            channel_title = resumed_entries[0]["channel_title"]
+            video_infos = []
+        else:
+            # Stream the XML feed from either local file or URL, stopping as soon as enough new videos are found
+            with self.metrics.stage("feed_parse"), ChannelFeed(feed_file) as feed:
+                channel_id = feed.channel_id
+                channel_title = feed.title
+                summarized_video_ids = self.__summarized_video_ids(channel_id)
+                new_video_infos = (vi for vi in feed if vi["id"] not in summarized_video_ids)
+                video_infos = list(itertools.islice(new_video_infos, max_summaries))
+
+            print(f"Found {len(video_infos)} new videos in channel {channel_id}.")
 
-        video_infos = [vi for vi in video_infos if not self.__is_summary_file_present(channel_id, vi)]
-        if max_summaries is not None:
-            video_infos = video_infos[:max_summaries]
+        # a summary file removed since then is summarized again, from the journal
+        new_video_ids = {video_info["id"] for video_info in video_infos}
+        resumed_entries = [entry for entry in resumed_entries if entry["video_id"] not in new_video_ids]
 
-        if len(video_infos) == 0:
+        if len(video_infos) == 0 and not resumed_entries:
             print("No new videos to summarize.")
-            return
+            self.feed_fetcher.save_validators(channel_id_or_file_path)
+            return None
 
+        if self.batch_jobs is not None:
+            self.__submit_batch_job(channel_id_or_file_path, channel_id, channel_title, video_infos)
+            return None
+
+        if resumed_entries:
+            print(f"Resuming {len(resumed_entries)} summaries of the last run...")
         print(f"Summarizing {len(video_infos)} new videos...")
-        summaries = []
+        self.__summarize_videos(channel_id_or_file_path, channel_id, channel_title, video_infos, journal_entries)
+
+        unsent_entries = [entry for entry in resumed_entries if not reached(entry, EMAILED)]
+        # the summaries are read back from their files, instead of all being kept in memory
+        video_ids = [entry["video_id"] for entry in unsent_entries] + [video_info["id"] for video_info in video_infos]
+        if video_ids:
+            print(f"Sending summary email to {email}...")
+            self.__send_email(email, channel_title, channel_id, video_ids)
+            for entry in unsent_entries:
+                self.__journal(channel_id_or_file_path, channel_id, channel_title, entry["video_info"], EMAILED)
+            for video_info in video_infos:
+                self.__journal(channel_id_or_file_path, channel_id, channel_title, video_info, EMAILED)
+
+        if max_summaries is None:
+            # with max_summaries, the feed might still have new videos for the next run
+            self.feed_fetcher.save_validators(channel_id_or_file_path)
+
+        return {"channel_id": channel_id, "title": channel_title, "count": len(resumed_entries) + len(video_infos)}
+
+    def __summarize_videos(self, key, channel_id, channel_title, video_infos, journal_entries):
+        """Summarize and save all videos."""
+        jobs = [(key, channel_id, channel_title, video_info, journal_entries.get(video_info["id"])) for video_info in video_infos]
+        if self.max_workers == 1:
+            for job in jobs:
+                self.__summarize_and_save_video(*job)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.__summarize_and_save_video, *job) for job in jobs]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def __summarize_and_save_video(self, key, channel_id, channel_title, video_info, journal_entry):
+        print(f"- Summarizing {video_info['title']} ({video_info['id']})\n")
+        self.__mark(channel_id, video_info, IN_PROGRESS)
+
+        try:
+            if journal_entry is not None and reached(journal_entry, SUMMARIZED):
+                # summarized by a failed run, no need to pay for it again
+                transcript_hash = journal_entry["transcript_hash"]
+                summary = journal_entry["summary"]
+            else:
+                transcript = self.__fetch_transcript(video_info["id"])
+                transcript_hash = content_hash(transcript)
+                self.__journal(key, channel_id, channel_title, video_info, FETCHED, transcript_hash=transcript_hash)
+
+                with self.summary_slots, self.__summarizer_usage("summarize", video_info["id"]):
+                    summary = self.__summarize_video(transcript, video_info)
+                self.__journal(key, channel_id, channel_title, video_info, SUMMARIZED, summary=summary)
+
+            self.__write_file(channel_id, video_info, summary)
+            self.__journal(key, channel_id, channel_title, video_info, WRITTEN)
+        except Exception as e:
+            self.__mark(channel_id, video_info, FAILED, error=str(e))
+            raise
+
+        self.__mark(channel_id, video_info, SUMMARIZED, transcript_hash=transcript_hash, summary_hash=content_hash(summary))
+
+    def __journal(self, key, channel_id, channel_title, video_info, stage, **fields):
+        if self.journal is not None:
+            self.journal.record(key, video_info["id"], stage, channel_id=channel_id, channel_title=channel_title,
+                                video_info=video_info, **fields)
+
+    def __clear_journal(self, key):
+        if self.journal is not None:
+            self.journal.clear(key)
+
+    def __submit_batch_job(self, key, channel_id, channel_title, video_infos):
+        """Submit the transcripts of the videos as a batch job, remembered until a later run collects it.
+
+        Transcripts too long for a single prompt are summarized straight away, and kept with the job.
+        """
+        batch_items = []
+        summaries = {}
+        transcript_hashes = {}
         for video_info in video_infos:
-            print(f"- Summarizing {video_info['title']} ({video_info['id']})\n")
+            self.__mark(channel_id, video_info, IN_PROGRESS)
+            try:
+                transcript = self.__fetch_transcript(video_info["id"])
+                if self.summarizer.chunker.fits(transcript):
+                    batch_items.append((video_info["id"], str(transcript)))
+                else:
+                    print(f"- Summarizing {video_info['title']} ({video_info['id']}), too long for a batch job\n")
+                    with self.summary_slots, self.__summarizer_usage("summarize", video_info["id"]):
+                        summaries[video_info["id"]] = self.__summarize_video(transcript, video_info)
+            except Exception as e:
+                self.__mark(channel_id, video_info, FAILED, error=str(e))
+                raise
+            transcript_hashes[video_info["id"]] = content_hash(transcript)
+
+        batch_id = self.summarizer.submit_batch(batch_items) if batch_items else None
+        self.batch_jobs.save(key, {
+            "batch_id": batch_id,
+            "channel_id": channel_id,
+            "title": channel_title,
+            "video_infos": video_infos,
+            "summaries": summaries,
+            "transcript_hashes": transcript_hashes
+        })
+        print(f"Submitted batch job {batch_id} for {len(batch_items)} videos of channel {channel_id}.")
+
+    def __collect_batch_job(self, key, batch_job, email):
+        """Write and email the summaries of a finished batch job, or return None if it is still running.
+
+        Videos whose request failed are marked as failed, so that the next run submits them again.
+        """
+        channel_id = batch_job["channel_id"]
+        results = {}
+        if batch_job["batch_id"] is not None:
+            results = self.summarizer.batch_results(batch_job["batch_id"])
+            if results is None:
+                print(f"Batch job {batch_job['batch_id']} of channel {channel_id} is still running.")
+                return None
+
+        video_ids = []
+        for video_info in batch_job["video_infos"]:
+            summary = batch_job["summaries"].get(video_info["id"])
+            if summary is None and video_info["id"] in results:
+                summary = self.__format_summary(results[video_info["id"]], video_info)
+            if summary is None:
+                self.__mark(channel_id, video_info, FAILED, error="Batch request failed.")
+                continue
 
-            transcript = self.transcript_service.fetch(video_info["id"])
-            summary = self.__summarize_video(transcript, video_info)
             self.__write_file(channel_id, video_info, summary)
+            self.__mark(channel_id, video_info, SUMMARIZED, transcript_hash=batch_job["transcript_hashes"][video_info["id"]],
+                        summary_hash=content_hash(summary))
+            video_ids.append(video_info["id"])
 
-            summaries.append(summary)
+        self.batch_jobs.remove(key)
+        print(f"Collected {len(video_ids)} of {len(batch_job['video_infos'])} summaries from batch job {batch_job['batch_id']}.")
+        if not video_ids:
+            return None
+
+        print(f"Sending summary email to {email}...")
+        self.__send_email(email, batch_job["title"], channel_id, video_ids)
+        return {"channel_id": channel_id, "title": batch_job["title"], "count": len(video_ids)}
+
+    def __mark(self, channel_id, video_info, status, **fields):
+        if self.state_store is not None:
+            self.state_store.mark(channel_id, video_info["id"], status, **fields)
+
+    def __fetch_transcript(self, video_id):
+        with self.metrics.stage("transcript_fetch", video_id):
+            transcript = self.__cached_or_fetched_transcript(video_id)
+        if self.transcript_cleaner is not None:
+            transcript = self.__clean_transcript(video_id, transcript)
+        self.metrics.add(video_id, transcript_chars=len(transcript))
+        return transcript
+
+    def __clean_transcript(self, video_id, transcript):
+        with self.metrics.stage("transcript_clean", video_id):
+            cleaned_transcript = self.transcript_cleaner.clean(transcript)
+
+        tokens = estimate_tokens(str(transcript))
+        cleaned_tokens = estimate_tokens(str(cleaned_transcript))
+        self.metrics.add(video_id, transcript_tokens=tokens, cleaned_transcript_tokens=cleaned_tokens)
+        print(f"- Cleaned transcript of {video_id}: {tokens} -> {cleaned_tokens} tokens "
+              f"(-{100 * (tokens - cleaned_tokens) / max(tokens, 1):.0f}%)")
+        return cleaned_transcript
+
+    def __cached_or_fetched_transcript(self, video_id):
+        language = getattr(self.transcript_service, "language", "en")
+        if self.transcript_cache is not None:
+            transcript = self.transcript_cache.get(video_id, language)
+            if transcript is not None:
+                self.metrics.add(video_id, transcript_cache_hits=1)
+                return transcript
+
+        with self.transcript_slots:
+            transcript = self.transcript_service.fetch(video_id)
+            rate_limiter = getattr(self.transcript_service, "rate_limiter", None)
+            self.metrics.add(video_id, transcript_bytes=len(str(transcript).encode('utf-8')),
+                             transcript_retries=rate_limiter.last_call_retries() if rate_limiter is not None else 0)
 
             # pause between requests to avoid rate limiting
             time.sleep(self.wait_between_requests)
 
-        print(f"Sending summary email to {email}...")
-        self.__send_email(email, channel_title, summaries)
+        if self.transcript_cache is not None:
+            self.transcript_cache.put(video_id, transcript, language)
 
-        if commit_summaries:
-            print("Committing summaries to git...")
-            self.git_repo.commit_and_push(channel_id, f"Add summaries for {len(video_infos)} videos from channel {channel_title}")
+        return transcript
 
-    def __get_channel_feed_xml_string(self, channel_id_or_file_path):
-        """Get XML feed string either from local file or by fetching from URL."""
+    @contextmanager
+    def __summarizer_usage(self, stage, video_id=None):
+        """Measure a stage of summarization, recording the tokens, cost, retries and cache hits of its requests.
+
+        Yields a wrapper for the functions the stage runs on other threads, so that their requests count too.
+        """
+        if not hasattr(self.summarizer, "usage_scope"):
+            with self.metrics.stage(stage, video_id):
+                yield lambda function: function
+            return
+
+        # a label of its own, even when the same video is summarized again by another run
+        label = object()
+
+        def in_usage_scope(function):
+            def function_in_usage_scope(*args, **kwargs):
+                with self.summarizer.usage_scope(label):
+                    return function(*args, **kwargs)
+            return function_in_usage_scope
+
+        with self.metrics.stage(stage, video_id), self.summarizer.usage_scope(label):
+            yield in_usage_scope
+
+        usage = self.summarizer.usage_stats(label)
+        self.metrics.add(video_id, requests=usage["requests"], input_tokens=usage["input_tokens"], output_tokens=usage["output_tokens"],
+                         cost=usage["cost"], summary_retries=usage["retries"], summary_cache_hits=usage["cache_hits"],
+                         hedged_requests=usage["hedged"])
+
+    def __print_run_report(self):
+        for name, service in [("Transcripts", self.transcript_service), ("Summaries", self.summarizer)]:
+            rate_limiter = getattr(service, "rate_limiter", None)
+            if rate_limiter is None:
+                continue
+            stats = rate_limiter.stats()
+            print(f"{name}: waited {stats['waited']:.1f}s for rate limiting, {stats['retries']} retries, {stats['bans']} bans.")
+
+        if self.transcript_cache is not None:
+            stats = self.transcript_cache.stats()
+            print(f"Transcript cache: {stats['hits']} hits, {stats['misses']} misses.")
+
+        totals = self.metrics.report()["totals"]
+        if totals.get("transcript_tokens"):
+            print(f"Transcript cleaning: {totals['transcript_tokens']} -> {totals['cleaned_transcript_tokens']} tokens.")
+
+        summary_cache = getattr(self.summarizer, "cache", None)
+        if summary_cache is not None:
+            stats = summary_cache.stats()
+            print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+
+        if hasattr(self.summarizer, "usage_stats"):
+            stats = self.summarizer.usage_stats()
+            if stats["requests"] > 0:
+                print(f"OpenAI: {stats['requests']} requests, {stats['input_tokens']} input and {stats['output_tokens']} output tokens, "
+                      f"median latency {stats['latency_p50']:.1f}s.")
+
+        backend = getattr(self.summarizer, "backend", None)
+        if backend is not None and backend.stats()["requests"] > 0:
+            stats = backend.stats()
+            print(f"Hedging: {stats['hedged']} of {stats['requests']} requests hedged ({stats['hedge_rate']:.0%}), {stats['failovers']} failovers, "
+                  f"p99 latency {stats['latency_p99']:.1f}s, hedging after {stats['hedge_delay']:.1f}s.")
+
+    def __open_channel_feed(self, channel_id_or_file_path):
+        """Open the XML feed as a binary file, either from local file or by fetching from URL, or None if it did not change."""
 
         if channel_id_or_file_path.endswith(".xml") and os.path.isfile(channel_id_or_file_path):
 
             print(f"Processing local RSS feed file: {channel_id_or_file_path}")
-            with open(channel_id_or_file_path, 'r', encoding='utf-8') as f:
-                xml_feed_string = f.read()
+            self.metrics.add(feed_bytes=os.path.getsize(channel_id_or_file_path))
+            return open(channel_id_or_file_path, 'rb')
 
         elif channel_id_or_file_path.startswith("UC") and len(channel_id_or_file_path) == 24:
 
-            rss_url = channel_rss_url(channel_id_or_file_path)
-            resp = requests.get(rss_url)
-            resp.raise_for_status()
-            xml_feed_string = resp.content
+            with self.metrics.stage("feed_fetch"):
+                feed_file = self.feed_fetcher.fetch(channel_id_or_file_path)
+            if feed_file is not None:
+                self.metrics.add(feed_bytes=feed_file.getbuffer().nbytes)
+            return feed_file
 
         else:
             raise RuntimeError(f"Invalid input: '{channel_id_or_file_path}'. Expected either a YouTube channel ID (starts with 'UC' and 24 characters long) or an XML file path (ends with '.xml').")
-        
-        return xml_feed_string
-
-    def __get_channel_title_and_videos_infos_from_xml(self, xml_feed_string):
-        """Extract channel title, video infos, and channel ID from XML root element."""
-        try:
-            root = ET.fromstring(xml_feed_string)
-            ns = {'yt': 'http://www.youtube.com/xml/schemas/2015', 'atom': 'http://www.w3.org/2005/Atom'}
-
-            # Extract channel ID from the RSS feed
-            channel_id_elem = root.find('yt:channelId', ns)
-            if channel_id_elem is None:
-                raise ValueError("No channelId found in RSS feed.")
-            channel_id = "UC" + channel_id_elem.text
-
-            # Channel title is the <title> directly under <feed>
-            channel_title_elem = root.find('atom:title', ns)
-            channel_title = channel_title_elem.text if channel_title_elem is not None else None
-
-            entries = root.findall('atom:entry', ns)
-
-            video_infos = []
-            for entry in entries:
-                video_id_elem = entry.find('yt:videoId', ns)
-                if video_id_elem is None:
-                    raise ValueError("No videoId found in entry.")
-
-                title_elem = entry.find('atom:title', ns)
-                if title_elem is None:
-                    raise ValueError("No title found in entry.")
-        
-                published_elem = entry.find('atom:published', ns)
-                if published_elem is None:
-                    raise ValueError("No published found in entry.")
-
-                video_infos.append({
-                    "id": video_id_elem.text,
-                    "title": title_elem.text,
-                    "published": published_elem.text,
-                    "url": f"https://www.youtube.com/watch?v={video_id_elem.text}"
-                })
-
-            return {"title": channel_title, "video_infos": video_infos, "channel_id": channel_id}
-        
-        except Exception as e:
-            raise RuntimeError(f"Failed to parse RSS feed XML: {e}")
-
 
     def __summarize_video(self, transcript, video_info):
-        summary = self.summarizer.summarize_text(transcript)
+        return self.__format_summary(self.summarizer.summarize_text(str(transcript)), video_info)
 
+    def __format_summary(self, summary, video_info):
         markdown_summary = f"# {video_info['title']}\n\n"
         markdown_summary += summary
         markdown_summary += f"\n\n*Published on {video_info['published']} at {video_info['url']}*\n"
 
         return markdown_summary
 
-    def __send_email(self, email, channel_title, summaries):
-        full_markdown = self.__generate_email_content(channel_title, summaries)
-
-        html_content = markdown.markdown(full_markdown)
-
-        self.email_service.send(email, f"🎬 [YouTube Summaries][{channel_title}] {self.email_subject_detail(summaries)}", html_content)
-
-    def email_subject_detail(self, summaries):
-        if len(summaries) == 1:
-            # Extract the title from the first line of the single summary
-            return summaries[0].split('\n', 1)[0].lstrip('# ').strip()
-        
-        return f"{len(summaries)} New Video Summaries Available"
-
-    def __generate_email_content(self, channel_title, summaries):
-        combined_md = [f"#{md}" for md in summaries]
-        summaries_markdown = "\n\n".join(combined_md).strip()
-        full_markdown = ""
-        meta_summary_md = ""
-        if (len(summaries) > 1):
-            meta_summary = self.summarizer.summarize_text(summaries_markdown)
-            meta_summary_md = f"\n## At a glance\n\n{meta_summary}\n"
-        
-        full_markdown = f"# Summaries for channel {channel_title}\n{meta_summary_md}\n{summaries_markdown}"
+    def __send_email(self, email, channel_title, channel_id, video_ids):
+        full_markdown = self.__generate_email_content(channel_title, channel_id, video_ids)
 
-        return full_markdown
+        import markdown
+        with self.metrics.stage("email_render"):
+            html_content = markdown.markdown(full_markdown)
 
-    def __is_summary_file_present(self, channel_id, video_info):
-        return os.path.exists(self.__summary_file_path(channel_id, video_info))
+        with self.metrics.stage("email_send"):
+            self.email_service.send(email, f"🎬 [YouTube Summaries][{channel_title}] {self.__email_subject_detail(channel_id, video_ids)}", html_content)
 
-    def __summary_file_path(self, channel_id, video_info):
-        return os.path.join(channel_id, self.__summary_file_name(video_info))
+    def __deliver_emails(self):
+        # an outbox only queues the emails of the run, until they are delivered here
+        if not hasattr(self.email_service, "deliver"):
+            return
+        with self.metrics.stage("email_deliver"):
+            self.email_service.deliver()
+
+    def __email_subject_detail(self, channel_id, video_ids):
+        if len(video_ids) == 1:
+            # the title of the single summary
+            return parse_summary(self.__read_summary(channel_id, video_ids[0]))[0]
+
+        return f"{len(video_ids)} New Video Summaries Available"
+
+    def __generate_email_content(self, channel_title, channel_id, video_ids):
+        """Markdown of the email, with the first MAX_EMAIL_SUMMARIES summaries in full, and links to the next ones."""
+        content = io.StringIO()
+        content.write(f"# Summaries for channel {channel_title}\n")
+        if len(video_ids) > 1:
+            with self.__summarizer_usage("meta_summary") as in_usage_scope:
+                meta_summary = TreeSummarizer(in_usage_scope(self.summarizer.summarize_text), self.meta_summary_tokens,
+                                              self.max_concurrent_summaries).summarize_all(self.__email_summaries(channel_id, video_ids))
+            content.write(f"\n## At a glance\n\n{meta_summary}\n")
+        content.write("\n")
+
+        # headings one level down, under the title of the email
+        content.write("\n\n".join(self.__email_summaries(channel_id, video_ids[:MAX_EMAIL_SUMMARIES])).strip())
+        if len(video_ids) > MAX_EMAIL_SUMMARIES:
+            content.write(f"\n\n## And {len(video_ids) - MAX_EMAIL_SUMMARIES} more videos\n\n")
+            for video_id in video_ids[MAX_EMAIL_SUMMARIES:]:
+                title, _, published, url = parse_summary(self.__read_summary(channel_id, video_id))
+                content.write(f"- [{title}]({url}), published on {published}\n")
+
+        return content.getvalue()
+
+    def __email_summaries(self, channel_id, video_ids):
+        for video_id in video_ids:
+            yield "#" + self.__read_summary(channel_id, video_id)
+
+    def __read_summary(self, channel_id, video_id):
+        with open(os.path.join(channel_id, f"{video_id}.md"), 'r') as f:
+            return f.read()
+
+    def __summarized_video_ids(self, channel_id):
+        """IDs of the videos with a summary file, found with a single directory scan."""
+        if self.state_store is not None:
+            self.state_store.import_channel_folder(channel_id)
+            return self.state_store.summarized_video_ids(channel_id)
+
+        if not os.path.isdir(channel_id):
+            return set()
+        return {entry.name[:-len(".md")] for entry in os.scandir(channel_id) if entry.name.endswith(".md")}
 
     def __write_file(self, channel_id, video_info, summary):
         os.makedirs(channel_id, exist_ok=True)
         summary_file_path = os.path.join(channel_id, self.__summary_file_name(video_info))
         with open(summary_file_path, 'w') as f:
             f.write(summary)
+        if self.search_index is not None:
+            self.search_index.add(channel_id, video_info["id"], summary, os.path.getmtime(summary_file_path))
 
     def __summary_file_name(self, video_info):
         return f"{video_info['id']}.md"
 
 def main():
     try:
-        channel_id_or_file_path, recipient_email, max_summaries, git_commits_enabled = parse_arguments()
-
-        api_key, gmail_username, gmail_password = load_environment_variables()
-                
-        YoutubeSummarizer(
-            summarizer=Summarizer(api_key),
-            transcripter=YoutubeTranscription(),
-            email_service=yagmail.SMTP(gmail_username, gmail_password),
-            git_repo=GitRepository()
-        ).run(channel_id_or_file_path, recipient_email, 
-              commit_summaries=git_commits_enabled, 
-              max_summaries=max_summaries)
+        channel_ids_or_file_paths, recipient_email, max_summaries, git_commits_enabled, options = parse_arguments()
+
+        metrics = RunMetrics()
+        youtube_summarizer = build_youtube_summarizer(options, metrics)
+
+        try:
+            if len(channel_ids_or_file_paths) == 1:
+                youtube_summarizer.run(channel_ids_or_file_paths[0], recipient_email, 
+                      commit_summaries=git_commits_enabled, 
+                      max_summaries=max_summaries)
+            else:
+                youtube_summarizer.run_channels(channel_ids_or_file_paths, recipient_email,
+                      commit_summaries=git_commits_enabled,
+                      max_summaries=max_summaries,
+                      max_parallel_channels=options["parallel-channels"])
+        finally:
+            # failed runs are the ones worth looking into
+            metrics.write_report(os.path.join(".cache", "run_report.json"))
+            if options["metrics-textfile"] is not None:
+                metrics.write_prometheus(options["metrics-textfile"])
 
     except Exception as e:
         sys.stderr.write(f"Unexpected error: {e}\n")
         sys.exit(1)
 
+# subject of the email merging the summaries of several channels, with --digest
+DIGEST_SUBJECT = "🎬 [YouTube Summaries] New videos from {count} channels"
+
+def build_youtube_summarizer(options, metrics=None):
+    """Wire the production services, with their caches and state under .cache.
+
+    The feed fetcher, state store and journal are all a run needs to find out that nothing is new: the
+    other services are only built once there is something to summarize.
+    """
+    api_key, gmail_username, gmail_password = load_environment_variables()
+
+    return YoutubeSummarizer(
+        summarizer=LazyService(lambda: Summarizer(api_key, cache=SummaryCache(os.path.join(".cache", "summaries.sqlite")),
+                                                  chunk_tokens=options["chunk-tokens"], max_fanout=options["fanout"],
+                                                  backend=summarizer_backend(api_key))),
+        transcripter=LazyService(lambda: YoutubeTranscription(rate_limiter=youtube_rate_limiter(os.path.join(".cache", "youtube_circuit.json")))),
+        email_service=EmailOutbox(os.path.join(".cache", "outbox"), SmtpSender("smtp.gmail.com", 465, gmail_username, gmail_password),
+                                  digest_subject=DIGEST_SUBJECT if options["digest"] else None),
+        git_repo=GitRepository(),
+        max_workers=options["workers"],
+        transcript_cache=LazyService(lambda: TranscriptCache(os.path.join(".cache", "transcripts"))),
+        state_store=StateStore(os.path.join(".cache", "state.sqlite")),
+        feed_fetcher=FeedFetcher(os.path.join(".cache", "feed_validators.json")),
+        batch_jobs=BatchJobs(os.path.join(".cache", "batches")) if options["batch"] else None,
+        journal=RunJournal(os.path.join(".cache", "journals")),
+        metrics=metrics,
+        transcript_cleaner=TranscriptCleaner(drop_filler=options["drop-filler"]),
+        search_index=LazyService(lambda: SearchIndex(os.path.join(".cache", "search.sqlite"))),
+        meta_summary_tokens=options["chunk-tokens"]
+    )
+
+def summarizer_backend(api_key):
+    """Hedge the requests to OpenAI with a second endpoint, when SECONDARY_OPENAI_BASE_URL or SECONDARY_OPENAI_MODEL is set."""
+    base_url = os.getenv("SECONDARY_OPENAI_BASE_URL")
+    model = os.getenv("SECONDARY_OPENAI_MODEL")
+    if not base_url and not model:
+        return None
+
+    from summarizer_backends import OpenAIBackend, HedgedBackend
+    secondary = OpenAIBackend("secondary", os.getenv("SECONDARY_OPENAI_API_KEY") or api_key, base_url=base_url, model=model)
+    return HedgedBackend(OpenAIBackend("primary", api_key), secondary, deadline=Summarizer.REQUEST_DEADLINE)
+
 def parse_arguments():
-    if len(sys.argv) < 4:
-        raise RuntimeError("Usage: python main.py <youtube_channel_id_or_file_path> <recipient_email> <--git-commits-on|--git-commits-off> [max_summaries]")
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--") and ("=" in arg or arg in FLAG_OPTIONS)]
+    args = [sys.argv[0]] + [arg for arg in sys.argv[1:] if arg not in options]
+
+    if len(args) < 4:
+        raise RuntimeError("Usage: python main.py <youtube_channel_id_or_file_path[,...]> <recipient_email> <--git-commits-on|--git-commits-off> [max_summaries] [--workers=N] [--parallel-channels=N] [--chunk-tokens=N] [--fanout=N] [--batch] [--drop-filler] [--digest] [--metrics-textfile=PATH]")
 
-    channel_id_or_file_path = sys.argv[1]
-    if not channel_id_or_file_path:
+    channel_ids_or_file_paths = args[1].split(",")
+    if not all(channel_ids_or_file_paths):
         raise RuntimeError("Invalid channel ID or file path.")
 
-    recipient_email = sys.argv[2]
+    recipient_email = args[2]
     if not recipient_email:
         raise RuntimeError("Invalid recipient email.")
 
-    git_arg = sys.argv[3]
+    git_arg = args[3]
     if git_arg == "--git-commits-on":
         git_commits_enabled = True
     elif git_arg == "--git-commits-off":
@@ -254,17 +887,55 @@ def parse_arguments():
         raise RuntimeError("Third argument must be --git-commits-on or --git-commits-off")
 
     max_summaries = None
-    if len(sys.argv) == 5:
-        try:
-            max_summaries = int(sys.argv[4])
-            if max_summaries < 1:
-                raise ValueError()
-        except ValueError:
-            raise RuntimeError("max_summaries must be a positive integer")
-    elif len(sys.argv) > 5:
+    if len(args) == 5:
+        max_summaries = parse_positive_integer(args[4], "max_summaries")
+    elif len(args) > 5:
         raise RuntimeError("Too many arguments. Expected at most 4 arguments.")
 
-    return channel_id_or_file_path, recipient_email, max_summaries, git_commits_enabled
+    return channel_ids_or_file_paths, recipient_email, max_summaries, git_commits_enabled, parse_options(options)
+
+DEFAULT_OPTIONS = {
+    "workers": 1,
+    "parallel-channels": 4,
+    "chunk-tokens": Summarizer.MAX_TRANSCRIPT_TOKENS,
+    "fanout": 4,
+    "batch": False,
+    "drop-filler": False,
+    "digest": False,
+    "metrics-textfile": None,
+}
+
+# options without a value
+FLAG_OPTIONS = {"--batch", "--drop-filler", "--digest"}
+# options with a path as value
+PATH_OPTIONS = {"--metrics-textfile"}
+
+def parse_options(options, defaults=DEFAULT_OPTIONS):
+    """Parse --name=value options into a dict, with defaults for the missing ones."""
+    parsed_options = dict(defaults)
+    for option in options:
+        if option in FLAG_OPTIONS:
+            parsed_options[option[2:]] = True
+            continue
+        name, value = option[2:].split("=", 1)
+        if name not in defaults or f"--{name}" in FLAG_OPTIONS:
+            raise RuntimeError(f"Unknown option: '--{name}'")
+        if f"--{name}" in PATH_OPTIONS:
+            if not value:
+                raise RuntimeError(f"--{name} must be a path")
+            parsed_options[name] = value
+            continue
+        parsed_options[name] = parse_positive_integer(value, f"--{name}")
+    return parsed_options
+
+def parse_positive_integer(value, name):
+    try:
+        number = int(value)
+        if number < 1:
+            raise ValueError()
+    except ValueError:
+        raise RuntimeError(f"{name} must be a positive integer")
+    return number
 
 def load_environment_variables():
     load_dotenv()